@@ -0,0 +1,153 @@
+# cache.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_CACHE_DIR = "data/cache/pages"
+
+
+def normalize_url(url):
+    """
+    Normalizes a URL so that trivially different spellings share a cache entry:
+    lowercases scheme and host, drops the fragment and trailing slash, and sorts the query.
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+class CacheEntry:
+    def __init__(self, url, html, fetched_at, etag=None, last_modified=None, fresh=True):
+        self.url = url
+        self.html = html
+        self.fetched_at = fetched_at
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+
+class PageCache:
+    """
+    Content-addressed on-disk cache of raw page HTML keyed by normalized URL.
+
+    Each entry is stored as `<sha256>.html` plus a `<sha256>.json` metadata file holding the
+    URL, fetch time and validators (ETag / Last-Modified). Entries older than `ttl` seconds are
+    returned as stale so callers can revalidate them; the least recently used entries are
+    evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=24 * 60 * 60, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # key -> size in bytes, ordered from least to most recently used
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.html'):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name[:-len('.html')], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _key(self, url):
+        return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.html', base + '.json'
+
+    def get(self, url):
+        """Returns the cached CacheEntry for `url` (fresh or stale), or None."""
+        key = self._key(url)
+        html_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(html_path, 'r', encoding='utf-8') as f:
+                html = f.read()
+            # The html file's mtime records last use so LRU order survives restarts
+            os.utime(html_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+
+        fresh = time.time() - meta['fetched_at'] < self.ttl
+        return CacheEntry(meta['url'], html, meta['fetched_at'], meta.get('etag'), meta.get('last_modified'), fresh)
+
+    def put(self, url, html, etag=None, last_modified=None):
+        key = self._key(url)
+        html_path, meta_path = self._paths(key)
+        data = html.encode('utf-8')
+        meta = {'url': normalize_url(url), 'fetched_at': time.time(), 'etag': etag, 'last_modified': last_modified}
+
+        # Write to temporary files first so readers never see a partial entry
+        for path, payload in ((html_path, data), (meta_path, json.dumps(meta).encode())):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._evict()
+
+    def touch(self, url):
+        """Marks an entry as freshly validated, e.g. after a 304 Not Modified response."""
+        key = self._key(url)
+        _, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        meta['fetched_at'] = time.time()
+        tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def entries(self):
+        """Yields (url, html) for every cached page, e.g. to replay extraction offline."""
+        with self._lock:
+            keys = list(self._index)
+        for key in keys:
+            html_path, meta_path = self._paths(key)
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                with open(html_path, 'r', encoding='utf-8') as f:
+                    yield meta['url'], f.read()
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.logger.info(f"Evicted cached page {key}")
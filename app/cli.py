@@ -0,0 +1,181 @@
+# cli.py
+"""
+Headless batch scraper: reads book URLs from a file or stdin, then scrapes, cleans and stores them.
+
+Progress is checkpointed to a journal after every chunk, so an interrupted run resumes
+where it left off when started again with the same journal. With --frontier the frontier
+itself is the checkpoint, so no journal is kept.
+
+Usage: python -m app.cli urls.txt [--journal data/scrape_journal.jsonl]
+       cat urls.txt | python -m app.cli -
+       python -m app.cli --frontier 1000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from app import metrics
+from app.cache import PageCache
+from app.db import ConnectionManager
+from app.discovery import Frontier
+from app.pipeline import process_urls
+from app.scraper import BookScraper
+from app.snapshot import refresh_snapshot
+
+# Journal statuses that mean a URL needs no further work; 'failed' URLs are retried on resume
+FINAL_STATUSES = {"stored", "invalid", "rejected"}
+
+DEFAULT_JOURNAL = "data/scrape_journal.jsonl"
+
+
+def read_urls(source):
+    """Reads one URL per line, skipping blanks, comments and duplicates while keeping order."""
+    f = sys.stdin if source == "-" else open(source)
+    try:
+        seen = set()
+        urls = []
+        for line in f:
+            url = line.strip()
+            if url and not url.startswith("#") and url not in seen:
+                seen.add(url)
+                urls.append(url)
+        return urls
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def load_journal(path):
+    """Returns {url: last status} from a checkpoint journal; a truncated last line is ignored."""
+    statuses = {}
+    if not os.path.exists(path):
+        return statuses
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            statuses[entry["url"]] = entry["status"]
+    return statuses
+
+
+def append_journal(path, entries):
+    with open(path, "a") as f:
+        for url, status in entries:
+            f.write(json.dumps({"url": url, "status": status, "at": time.time()}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+async def run(urls, journal_path, db=None, chunk_size=50, max_concurrency=2, requests_per_second=1.0,
+              batch_size=100, cache=None, frontier=None, metrics_file=None):
+    # In frontier mode the frontier decides what is pending; a journal would skip requeued URLs forever
+    statuses = load_journal(journal_path) if journal_path else {}
+    pending = [url for url in urls if statuses.get(url) not in FINAL_STATUSES]
+    stats = {"total": len(urls), "skipped": len(urls) - len(pending), "stored": 0, "inserted": 0, "updated": 0,
+             "unchanged": 0, "invalid": 0, "failed": 0, "rejected": 0}
+    logging.info(f"{stats['skipped']} of {len(urls)} URLs already done, {len(pending)} to scrape")
+
+    start = time.monotonic()
+    async with BookScraper(headless=True, max_concurrency=max_concurrency,
+                           requests_per_second=requests_per_second, cache=cache) as scraper:
+        for offset in range(0, len(pending), chunk_size):
+            chunk = pending[offset:offset + chunk_size]
+            outcome = await process_urls(scraper, chunk, db, batch_size=batch_size)
+            if outcome["db_error"]:
+                # Nothing from this chunk is checkpointed, so it is redone on resume
+                raise RuntimeError(f"Database write failed: {outcome['db_error']}")
+
+            entries = [(url, "invalid") for url in outcome["invalid"]]
+            entries += [(url, "failed") for url in outcome["failed"]]
+            entries += [(url, "rejected") for url in outcome["rejected"]]
+            entries += [(book["url"], "stored") for book in outcome["books"]]
+            if journal_path:
+                append_journal(journal_path, entries)
+            if frontier:
+                frontier.mark_scraped([url for url, status in entries if status in FINAL_STATUSES])
+
+            for key in ("invalid", "failed", "rejected", "inserted", "updated", "unchanged"):
+                stats[key] += len(outcome[key])
+            stats["stored"] += len(outcome["books"])
+            done = offset + len(chunk)
+            elapsed = time.monotonic() - start
+            logging.info(f"{done}/{len(pending)} URLs processed, {done / elapsed:.2f} pages/s")
+            if metrics_file:
+                metrics.REGISTRY.write_prometheus(metrics_file)
+
+    stats["elapsed"] = time.monotonic() - start
+    return stats
+
+
+def print_stats(stats):
+    processed = stats["total"] - stats["skipped"]
+    rate = processed / stats["elapsed"] if stats["elapsed"] else 0.0
+    print(f"URLs:        {stats['total']} ({stats['skipped']} skipped from journal)")
+    print(f"Processed:   {processed} in {stats['elapsed']:.1f}s ({rate:.2f} pages/s)")
+    print(f"Stored:      {stats['stored']} ({stats['inserted']} inserted, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged)")
+    print(f"Failed:      {stats['failed']}")
+    print(f"Rejected:    {stats['rejected']}")
+    print(f"Invalid:     {stats['invalid']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Packt book URLs without the Streamlit app.")
+    parser.add_argument("source", nargs="?", help="File with one URL per line, or - for stdin")
+    parser.add_argument("--frontier", type=int, metavar="N", help="Scrape the next N URLs from the discovery frontier")
+    parser.add_argument("--journal", help=f"Checkpoint journal path (default: {DEFAULT_JOURNAL}; "
+                                          "not used with --frontier)")
+    parser.add_argument("--chunk-size", type=int, default=50, help="URLs scraped between checkpoints")
+    parser.add_argument("--concurrency", type=int, default=2, help="Pages scraped in parallel")
+    parser.add_argument("--rps", type=float, default=1.0, help="Requests per second per host")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per database upsert")
+    parser.add_argument("--no-db", action="store_true", help="Scrape and clean without storing")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk page cache")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics here after every chunk")
+    args = parser.parse_args(argv)
+    if (args.source is None) == (args.frontier is None):
+        parser.error("give either a URL source or --frontier")
+    if args.frontier is not None and args.no_db:
+        parser.error("--frontier needs the database")
+    if args.frontier is not None and args.journal:
+        parser.error("--frontier keeps its own checkpoint and takes no --journal")
+    journal = None if args.frontier is not None else args.journal or DEFAULT_JOURNAL
+
+    load_dotenv()
+    if journal:
+        os.makedirs(os.path.dirname(journal) or ".", exist_ok=True)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    db = None if args.no_db else ConnectionManager.from_env()
+    cache = None if args.no_cache else PageCache()
+    try:
+        frontier = Frontier(db) if args.frontier is not None else None
+        urls = frontier.pending(args.frontier) if frontier else read_urls(args.source)
+        stats = asyncio.run(run(urls, journal, db=db, chunk_size=args.chunk_size,
+                                max_concurrency=args.concurrency, requests_per_second=args.rps,
+                                batch_size=args.batch_size, cache=cache, frontier=frontier,
+                                metrics_file=args.metrics_file))
+        if db and (stats["inserted"] or stats["updated"]):
+            try:
+                refresh_snapshot(db)
+            except Exception as e:
+                logging.error(f"Failed to refresh the catalog snapshot: {str(e)}")
+    except KeyboardInterrupt:
+        resume = "the same journal" if journal else "--frontier"
+        print(f"Interrupted; rerun with {resume} to resume.", file=sys.stderr)
+        return 130
+    finally:
+        if db:
+            db.close()
+    print_stats(stats)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+# db.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+import psycopg2
+import psycopg2.errors
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+BOOK_COLUMNS = [
+    "title", "author", "original_price", "discounted_price", "rating", "num_ratings",
+    "publication_date", "pages", "edition", "key_benefits", "description", "what_you_will_learn", "url",
+    "original_price_cents", "discounted_price_cents", "currency"
+]
+
+# Typed columns and the expression that converts a legacy text value in place
+TYPED_COLUMNS = {
+    "publication_date": ("date", "CASE WHEN publication_date::text ~ '^[A-Z][a-z]{2} [0-9]{4}$' "
+                                 "THEN to_date(publication_date::text, 'Mon YYYY') END"),
+    "rating": ("double precision", "NULLIF(substring(rating::text from '[0-9]+\\.?[0-9]*'), '')::double precision"),
+    "num_ratings": ("integer", "NULLIF(regexp_replace(num_ratings::text, '[^0-9]', '', 'g'), '')::integer"),
+    "pages": ("integer", "NULLIF(regexp_replace(pages::text, '[^0-9]', '', 'g'), '')::integer"),
+}
+
+
+JSON_COLUMNS = {"key_benefits", "what_you_will_learn"}
+
+# Channel notified by the books_version trigger whenever books changes
+BOOKS_CHANGED_CHANNEL = "books_changed"
+
+# Changes to these columns are appended to book_history
+HISTORY_COLUMNS = ["original_price_cents", "discounted_price_cents", "currency", "rating", "num_ratings"]
+
+
+class ConnectionManager:
+    """
+    Thread-safe pool of PostgreSQL connections shared by every page and session.
+
+    Connections are checked for liveness on checkout and replaced if broken, so a dropped
+    connection or aborted transaction no longer poisons the app until restart. Every
+    connection runs with a server-side statement timeout.
+    """
+
+    def __init__(self, min_size=1, max_size=10, statement_timeout_ms=30000, **connect_params):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.connect_params = dict(connect_params)
+        self.connect_params["options"] = f"-c statement_timeout={statement_timeout_ms}"
+        self.logger = logging.getLogger(__name__)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises when exhausted; this makes callers wait for a free slot instead
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Builds a manager from the DB_* environment variables."""
+        return cls(
+            host=os.getenv('DB_HOST'),
+            database=os.getenv('DB_NAME'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASS'),
+            port=os.getenv('DB_PORT'),
+            sslmode=os.getenv('DB_SSLMODE', 'require'),
+            connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            **kwargs
+        )
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # Created lazily so the app can start, and later recover, while the database is down
+                self._pool = ThreadedConnectionPool(self.min_size, self.max_size, **self.connect_params)
+            return self._pool
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        try:
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self, pool, attempts=2):
+        for _ in range(attempts):
+            conn = pool.getconn()
+            if self._is_alive(conn):
+                return conn
+            self.logger.warning("Discarding broken database connection")
+            pool.putconn(conn, close=True)
+        return pool.getconn()
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a live connection. The transaction is rolled back if the block raises,
+        and the connection is returned to the pool either way.
+        """
+        self._slots.acquire()
+        pool = conn = None
+        try:
+            pool = self._get_pool()
+            conn = self._checkout(pool)
+            yield conn
+        except Exception:
+            if conn is not None and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            if conn is not None:
+                pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+
+MIGRATION_HINT = "run `python -m app.migrations` first"
+
+
+def ensure_url_index(db_conn):
+    """
+    Creates the unique index on books.url that the upsert relies on. Duplicate rows left by
+    the old SELECT-then-INSERT path are removed by the migration, not here.
+    """
+    try:
+        with db_conn.cursor() as cur:
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS books_url_key ON books (url)")
+        db_conn.commit()
+    except psycopg2.errors.UniqueViolation as e:
+        db_conn.rollback()
+        raise RuntimeError(f"books has duplicate URLs; {MIGRATION_HINT}") from e
+
+
+def legacy_typed_columns(db_conn):
+    """Returns the TYPED_COLUMNS of books in the current schema that are still stored as text."""
+    with db_conn.cursor() as cur:
+        cur.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'books' AND column_name = ANY(%s)
+        """, (list(TYPED_COLUMNS),))
+        current_types = dict(cur.fetchall())
+    db_conn.rollback()
+    return [column for column, data_type in current_types.items() if data_type != TYPED_COLUMNS[column][0]]
+
+
+def ensure_typed_columns(db_conn):
+    """
+    Adds the integer-cents price columns and their indexes. Fails fast if publication_date,
+    rating, num_ratings or pages are still text: converting them rewrites the table, so it is
+    left to the one-off migration.
+    """
+    legacy = legacy_typed_columns(db_conn)
+    if legacy:
+        raise RuntimeError(f"books.{', books.'.join(legacy)} still stored as text; {MIGRATION_HINT}")
+    with db_conn.cursor() as cur:
+        cur.execute("""
+        ALTER TABLE books
+            ADD COLUMN IF NOT EXISTS original_price_cents integer,
+            ADD COLUMN IF NOT EXISTS discounted_price_cents integer,
+            ADD COLUMN IF NOT EXISTS currency char(3)
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS books_discounted_price_cents_idx ON books (discounted_price_cents)")
+        cur.execute("CREATE INDEX IF NOT EXISTS books_publication_date_idx ON books (publication_date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS books_rating_idx ON books (rating)")
+    db_conn.commit()
+
+
+def ensure_change_tracking(db_conn):
+    """
+    Adds books.content_hash, the fingerprint that lets unchanged re-scrapes skip their write,
+    and the book_history table holding one compact row per observed price or rating change.
+    """
+    with db_conn.cursor() as cur:
+        cur.execute("ALTER TABLE books ADD COLUMN IF NOT EXISTS content_hash text")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS book_history (
+            url TEXT NOT NULL,
+            observed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            original_price_cents INTEGER,
+            discounted_price_cents INTEGER,
+            currency TEXT,
+            rating DOUBLE PRECISION,
+            num_ratings INTEGER
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS book_history_url_idx ON book_history (url, observed_at)")
+    db_conn.commit()
+
+
+_prepared_databases = set()
+_updated_at_databases = set()
+
+
+def prepare_books_schema(db_conn):
+    """Runs the schema steps the writer depends on, once per database per process."""
+    if db_conn.dsn in _prepared_databases:
+        return
+    ensure_url_index(db_conn)
+    ensure_typed_columns(db_conn)
+    prepare_updated_at(db_conn)
+    ensure_change_tracking(db_conn)
+    _prepared_databases.add(db_conn.dsn)
+
+
+def prepare_updated_at(db_conn):
+    """Runs ensure_updated_at once per database per process, for exports and snapshot refreshes."""
+    if db_conn.dsn in _updated_at_databases:
+        return
+    ensure_updated_at(db_conn)
+    _updated_at_databases.add(db_conn.dsn)
+
+
+def _comparable(column, value):
+    """Normalizes a value from a cleaned record or from the database so equal content compares equal."""
+    if value is None:
+        return None
+    if column in JSON_COLUMNS:
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except json.JSONDecodeError:
+                return value
+        return list(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return float(value)
+    return str(value)
+
+
+def book_fingerprint(book):
+    """Returns a sha256 over the cleaned fields of a book record."""
+    payload = [_comparable(column, book.get(column)) for column in BOOK_COLUMNS]
+    return hashlib.sha256(json.dumps(payload, default=str).encode()).hexdigest()
+
+
+def _book_row(book, fingerprint):
+    row = tuple(json.dumps(book[column]) if column in JSON_COLUMNS else book[column] for column in BOOK_COLUMNS)
+    return row + (fingerprint,)
+
+
+class BookWriter:
+    """
+    Buffers cleaned book records and writes them in batches, in a single transaction per batch.
+
+    Each record is fingerprinted: books whose fingerprint matches the stored one are skipped,
+    changed books only have their differing columns updated, and new books are inserted with
+    one multi-row INSERT ... ON CONFLICT (url). New values of HISTORY_COLUMNS are appended to
+    book_history, so price and rating trends survive the update.
+
+    A batch is flushed once `batch_size` records are buffered or `flush_interval`
+    seconds have passed since the last flush. Call flush() when done to write the remainder.
+    """
+
+    def __init__(self, db_conn, batch_size=100, flush_interval=5.0):
+        self.db_conn = db_conn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self.inserted = []
+        self.updated = []
+        self.unchanged = []
+        self._buffer = {}
+        self._last_flush = time.monotonic()
+        prepare_books_schema(db_conn)
+
+    def add(self, book):
+        """Buffers a record, flushing if the batch is full or the interval elapsed."""
+        # Keyed by URL: one statement cannot upsert the same row twice
+        self._buffer[book['url']] = book
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """
+        Writes all buffered records.
+        Returns {'inserted': [urls], 'updated': [urls], 'unchanged': [urls]} for this batch.
+        """
+        self._last_flush = time.monotonic()
+        result = {'inserted': [], 'updated': [], 'unchanged': []}
+        if not self._buffer:
+            return result
+
+        books = list(self._buffer.values())
+        self._buffer = {}
+        fingerprints = {book['url']: book_fingerprint(book) for book in books}
+
+        try:
+            with self.db_conn.cursor(cursor_factory=RealDictCursor) as cur:
+                # Locked so a concurrent writer cannot change a row between the diff and the update
+                cur.execute(f"SELECT {', '.join(BOOK_COLUMNS)}, content_hash FROM books WHERE url = ANY(%s) "
+                            "FOR UPDATE", (list(fingerprints),))
+                existing = {row['url']: row for row in cur.fetchall()}
+
+                new_books = []
+                changes = {}
+                history = []
+                for book in books:
+                    row = existing.get(book['url'])
+                    if row is None:
+                        new_books.append(book)
+                        history.append(book)
+                        continue
+                    if row['content_hash'] == fingerprints[book['url']]:
+                        result['unchanged'].append(book['url'])
+                        continue
+                    diff = tuple(column for column in BOOK_COLUMNS
+                                 if _comparable(column, book.get(column)) != _comparable(column, row[column]))
+                    # An empty diff only refreshes the fingerprint, e.g. for rows written before it existed
+                    changes.setdefault(diff, []).append(book)
+                    result['updated' if diff else 'unchanged'].append(book['url'])
+                    if any(column in HISTORY_COLUMNS for column in diff):
+                        history.append(book)
+
+                if new_books:
+                    result['inserted'] = self._insert(cur, new_books, fingerprints)
+                for diff, group in changes.items():
+                    self._update(cur, diff, group, fingerprints)
+                if history:
+                    execute_values(cur, f"INSERT INTO book_history (url, {', '.join(HISTORY_COLUMNS)}) VALUES %s",
+                                   [(book['url'],) + tuple(book.get(column) for column in HISTORY_COLUMNS)
+                                    for book in history], page_size=len(history))
+            self.db_conn.commit()
+        except Exception:
+            self.db_conn.rollback()
+            raise
+
+        self.inserted.extend(result['inserted'])
+        self.updated.extend(result['updated'])
+        self.unchanged.extend(result['unchanged'])
+        self.logger.info(f"Wrote {len(books)} books: {len(result['inserted'])} inserted, "
+                         f"{len(result['updated'])} updated, {len(result['unchanged'])} unchanged")
+        return result
+
+    def _insert(self, cur, books, fingerprints):
+        columns = ", ".join(BOOK_COLUMNS + ["content_hash"])
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in BOOK_COLUMNS + ["content_hash"]
+                            if column != "url")
+        # ON CONFLICT covers a row inserted by another writer since the SELECT above
+        query = f"""
+        INSERT INTO books ({columns}) VALUES %s
+        ON CONFLICT (url) DO UPDATE SET {updates}
+        RETURNING url
+        """
+        returned = execute_values(cur, query, [_book_row(book, fingerprints[book['url']]) for book in books],
+                                  page_size=len(books), fetch=True)
+        return [row['url'] for row in returned]
+
+    def _update(self, cur, columns, books, fingerprints):
+        """Updates only `columns` (plus the fingerprint) for books that share the same diff."""
+        assignments = ", ".join(f"{column} = v.{column}" for column in columns + ("content_hash",))
+        # json_populate_recordset types each value by the books row type, so all-NULL columns still cast
+        records = [dict({column: book.get(column) for column in columns},
+                        url=book['url'], content_hash=fingerprints[book['url']]) for book in books]
+        cur.execute(f"""
+        UPDATE books AS b SET {assignments}
+        FROM json_populate_recordset(NULL::books, %s::json) AS v
+        WHERE b.url = v.url
+        """, (json.dumps(records, default=str),))
+
+
+# Built by the migration, CONCURRENTLY, since they can take a while on a large table
+SEARCH_INDEXES = {
+    "books_search_vector_idx": "ON books USING GIN (search_vector)",
+    "books_title_trgm_idx": "ON books USING GIN (title gin_trgm_ops)",
+    "books_author_trgm_idx": "ON books USING GIN (author gin_trgm_ops)",
+    "books_title_url_idx": "ON books (title, url)",
+}
+
+
+def _has_trigger(db_conn, name):
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = 'books'::regclass AND tgname = %s", (name,))
+        found = cur.fetchone() is not None
+    db_conn.rollback()
+    return found
+
+
+def ensure_search_schema(db_conn):
+    """
+    Maintains a weighted tsvector over title, author, description and learning outcomes.
+    Only installs the column and trigger, and only if the trigger is missing; backfilling
+    existing rows and building the GIN and trigram indexes is left to the migration.
+    """
+    if not _has_trigger(db_conn, "books_search_vector_trigger"):
+        with db_conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute("ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector")
+            cur.execute("""
+            CREATE OR REPLACE FUNCTION books_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector :=
+                    setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(NEW.author, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+                    setweight(to_tsvector('english', coalesce(NEW.what_you_will_learn::text, '')), 'C');
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+            """)
+            cur.execute("""
+            CREATE TRIGGER books_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF title, author, description, what_you_will_learn ON books
+            FOR EACH ROW EXECUTE FUNCTION books_search_vector_update()
+            """)
+        db_conn.commit()
+
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'books'")
+        missing = set(SEARCH_INDEXES) - {name for (name,) in cur.fetchall()}
+    db_conn.rollback()
+    if missing:
+        logging.warning(f"Search indexes {', '.join(sorted(missing))} are missing; {MIGRATION_HINT}")
+
+
+def ensure_books_version(db_conn):
+    """
+    Keeps a single-row counter that is bumped by every statement that changes books, and
+    notifies BOOKS_CHANGED_CHANNEL, so cached results can be invalidated exactly when the data changes.
+    Does nothing if the trigger already exists, so app startup takes no lock on books.
+    """
+    if _has_trigger(db_conn, "books_version_trigger"):
+        return
+    with db_conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS books_version (
+            id boolean PRIMARY KEY DEFAULT true CHECK (id),
+            version bigint NOT NULL DEFAULT 0
+        )
+        """)
+        cur.execute("INSERT INTO books_version (id, version) VALUES (true, 0) ON CONFLICT (id) DO NOTHING")
+        cur.execute(f"""
+        CREATE OR REPLACE FUNCTION books_version_bump() RETURNS trigger AS $$
+        BEGIN
+            UPDATE books_version SET version = version + 1;
+            PERFORM pg_notify('{BOOKS_CHANGED_CHANNEL}', '');
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """)
+        cur.execute("""
+        CREATE TRIGGER books_version_trigger
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON books
+        FOR EACH STATEMENT EXECUTE FUNCTION books_version_bump()
+        """)
+    db_conn.commit()
+
+
+def get_books_version(db_conn):
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT version FROM books_version")
+        row = cur.fetchone()
+    db_conn.rollback()
+    return row[0] if row else 0
+
+
+def ensure_updated_at(db_conn):
+    """
+    Adds books.updated_at, kept current by a trigger, so exports can pick up only changed rows.
+    Does nothing if the trigger already exists, so no ACCESS EXCLUSIVE lock is taken on books.
+    """
+    if _has_trigger(db_conn, "books_updated_at_trigger"):
+        return
+    with db_conn.cursor() as cur:
+        cur.execute("ALTER TABLE books ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now()")
+        cur.execute("""
+        CREATE OR REPLACE FUNCTION books_touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """)
+        cur.execute("DROP TRIGGER IF EXISTS books_updated_at_trigger ON books")
+        cur.execute("""
+        CREATE TRIGGER books_updated_at_trigger
+        BEFORE UPDATE ON books
+        FOR EACH ROW EXECUTE FUNCTION books_touch_updated_at()
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS books_updated_at_idx ON books (updated_at)")
+    db_conn.commit()
@@ -0,0 +1,41 @@
+# diagnostics.py
+import streamlit as st
+import pandas as pd
+from app.metrics import REGISTRY
+
+
+def diagnostics_page(query_cache=None):
+    """Shows stage timings, counters and gauges recorded by this app process."""
+    if query_cache:
+        stats = query_cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+        st.caption(f"Query cache: {stats['entries']} entries, {stats['bytes'] / 2 ** 20:.1f} MiB, "
+                   f"hit rate {hit_rate}, {'listening for changes' if stats['listening'] else 'polling version'}")
+    timings, counters, gauges = REGISTRY.summary()
+    if not timings and not counters:
+        st.info("No metrics recorded yet. Scrape some books first.")
+        return
+
+    st.subheader("Stage timings")
+    if timings:
+        df = pd.DataFrame(timings).drop(columns=["metric"])
+        st.dataframe(df, use_container_width=True, hide_index=True,
+                     column_config={column: st.column_config.NumberColumn(column, format="%.1f")
+                                    for column in ("mean_ms", "p50_ms", "p95_ms", "p99_ms")})
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Counters")
+        if counters:
+            st.dataframe(pd.DataFrame(counters), use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader("Gauges")
+        if gauges:
+            st.dataframe(pd.DataFrame(gauges), use_container_width=True, hide_index=True)
+
+    st.download_button("Download Prometheus metrics", REGISTRY.render_prometheus(),
+                       file_name="metrics.prom", mime="text/plain")
+    if st.button("Reset metrics"):
+        REGISTRY.reset()
+        st.rerun()
@@ -0,0 +1,283 @@
+# discovery.py
+"""
+Discovers book URLs from Packt sitemaps and category/listing pages and queues them in a
+persistent frontier table that feeds the batch scraper.
+
+Usage: python -m app.discovery --sitemap https://www.packtpub.com/sitemap.xml
+       python -m app.discovery --listing https://www.packtpub.com/en-us/data --max-pages 200
+"""
+import argparse
+import gzip
+import logging
+import time
+import zlib
+from collections import deque
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import requests
+from dotenv import load_dotenv
+from lxml import etree, html
+from psycopg2.extras import execute_values
+from app.cache import normalize_url
+from app.db import ConnectionManager
+from app.http_scraper import HttpBookFetcher
+from app.utils import validate_url
+
+BOOK_HOST = "www.packtpub.com"
+# Book pages live under /product/ (optionally behind a locale prefix such as /en-us)
+BOOK_PATH_SEGMENT = "product"
+# Query parameters that select another page of a listing; every other parameter is dropped
+PAGINATION_PARAMS = ("page",)
+
+SITEMAP_NS = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+SITEMAP_LOC_XPATH = etree.XPath("//sm:sitemap/sm:loc/text()", namespaces=SITEMAP_NS)
+URLSET_LOC_XPATH = etree.XPath("//sm:url/sm:loc/text()", namespaces=SITEMAP_NS)
+LINK_XPATH = etree.XPath("//a[@href]/@href")
+NEXT_LINK_XPATH = etree.XPath("//link[@rel='next']/@href | //a[@rel='next']/@href")
+
+# Sitemap entries are authoritative, so they are scraped before URLs only seen on listing pages
+SITEMAP_PRIORITY = 100
+LISTING_PRIORITY = 50
+
+
+def canonicalize_book_url(url):
+    """
+    Returns the canonical form of a book page URL, or None if `url` is not a book page.
+    The scheme and host are unified and the query and fragment dropped, so tracking
+    parameters and trailing slashes never produce a second frontier entry.
+    """
+    parts = urlsplit(normalize_url(url))
+    if parts.netloc not in (BOOK_HOST, BOOK_HOST[len("www."):]):
+        return None
+    if BOOK_PATH_SEGMENT not in parts.path.split("/"):
+        return None
+    canonical = urlunsplit(("https", BOOK_HOST, parts.path, "", ""))
+    return canonical if validate_url(canonical) else None
+
+
+def canonicalize_listing_url(url):
+    """Like canonicalize_book_url for listing pages, keeping only the pagination parameters."""
+    parts = urlsplit(normalize_url(url))
+    if parts.netloc not in (BOOK_HOST, BOOK_HOST[len("www."):]):
+        return None
+    query = "&".join(param for param in parts.query.split("&") if param.split("=")[0] in PAGINATION_PARAMS)
+    return urlunsplit(("https", BOOK_HOST, parts.path, query, ""))
+
+
+def parse_sitemap(content):
+    """
+    Parses a sitemap or sitemap index (plain or gzipped bytes).
+    Returns (book_urls, child_sitemap_urls); non-book pages in a urlset are ignored.
+    """
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    tree = etree.fromstring(content, parser=etree.XMLParser(resolve_entities=False, huge_tree=True))
+    sitemaps = [loc.strip() for loc in SITEMAP_LOC_XPATH(tree)]
+    book_urls = _unique(canonicalize_book_url(loc) for loc in URLSET_LOC_XPATH(tree))
+    return book_urls, sitemaps
+
+
+def parse_listing_page(page_html, base_url):
+    """
+    Extracts links from a category or listing page.
+    Returns (book_urls, listing_urls): canonical book pages, and further pages of the same
+    listing (rel=next or ?page= links under the same path) to crawl.
+    """
+    tree = html.fromstring(page_html)
+    base_path = urlsplit(base_url).path.rstrip("/")
+    book_urls = []
+    listing_urls = [urljoin(base_url, href) for href in NEXT_LINK_XPATH(tree)]
+    for href in LINK_XPATH(tree):
+        url = urljoin(base_url, href)
+        book_url = canonicalize_book_url(url)
+        if book_url:
+            book_urls.append(book_url)
+        elif urlsplit(url).path.rstrip("/") == base_path and "page=" in urlsplit(url).query:
+            listing_urls.append(url)
+    return _unique(book_urls), _unique(canonicalize_listing_url(url) for url in listing_urls)
+
+
+def _unique(urls):
+    """Drops None and duplicates, keeping first-seen order."""
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+def ensure_frontier_schema(db_conn):
+    """
+    Creates the url_frontier table. Pending URLs are served from a partial index ordered by
+    priority, so claiming work stays an index scan however many URLs have been scraped.
+    """
+    with db_conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS url_frontier (
+            url TEXT PRIMARY KEY,
+            priority INTEGER NOT NULL DEFAULT 0,
+            source TEXT,
+            discovered_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            last_seen_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            scraped_at TIMESTAMPTZ
+        )
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS url_frontier_pending_idx
+        ON url_frontier (priority DESC, discovered_at) WHERE scraped_at IS NULL
+        """)
+    db_conn.commit()
+
+
+class Frontier:
+    """
+    Persistent, deduplicated queue of book URLs waiting to be scraped.
+
+    URLs are canonicalized before they are stored, and re-discovering a known URL only bumps
+    its last_seen_at (and raises its priority), so the table holds one row per book.
+    """
+
+    def __init__(self, db, page_size=1000):
+        self.db = db
+        self.page_size = page_size
+        with db.connection() as conn:
+            ensure_frontier_schema(conn)
+
+    def add(self, urls, priority=0, source=None):
+        """Queues URLs, returning how many were new to the frontier."""
+        rows = [(url, priority, source) for url in _unique(canonicalize_book_url(url) for url in urls)]
+        if not rows:
+            return 0
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                returned = execute_values(cur, """
+                INSERT INTO url_frontier (url, priority, source) VALUES %s
+                ON CONFLICT (url) DO UPDATE SET
+                    last_seen_at = now(),
+                    priority = GREATEST(url_frontier.priority, EXCLUDED.priority)
+                RETURNING (xmax = 0) AS inserted
+                """, rows, page_size=self.page_size, fetch=True)
+            conn.commit()
+        return sum(1 for (inserted,) in returned if inserted)
+
+    def pending(self, limit):
+        """Returns up to `limit` unscraped URLs, highest priority and oldest first."""
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                SELECT url FROM url_frontier WHERE scraped_at IS NULL
+                ORDER BY priority DESC, discovered_at LIMIT %s
+                """, (limit,))
+                urls = [url for (url,) in cur.fetchall()]
+            conn.rollback()
+        return urls
+
+    def mark_scraped(self, urls):
+        """Removes URLs from the pending set; they stay in the table so they are not re-queued."""
+        urls = _unique(canonicalize_book_url(url) for url in urls)
+        if not urls:
+            return
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE url_frontier SET scraped_at = now() WHERE url = ANY(%s)", (urls,))
+            conn.commit()
+
+    def requeue_stale(self, max_age_days):
+        """Makes URLs scraped more than `max_age_days` ago pending again, for periodic refreshes."""
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                UPDATE url_frontier SET scraped_at = NULL
+                WHERE scraped_at < now() - make_interval(days => %s)
+                """, (max_age_days,))
+                requeued = cur.rowcount
+            conn.commit()
+        return requeued
+
+
+class DiscoveryCrawler:
+    """
+    Walks sitemaps and listing pages breadth first and feeds book URLs into a Frontier.
+    Pages are fetched over the same pooled HTTP session as the browserless scraper,
+    at most `requests_per_second` per second.
+    """
+
+    def __init__(self, frontier, requests_per_second=1.0, max_pages=500, timeout=15):
+        self.frontier = frontier
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.logger = logging.getLogger(__name__)
+        self._fetcher = HttpBookFetcher(pool_size=1, timeout=timeout)
+        self._last_request = 0.0
+
+    def _fetch(self, url):
+        wait = self._last_request + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+        response = self._fetcher.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def crawl(self, sitemaps=(), listings=()):
+        """Crawls from the given seeds. Returns {'pages', 'found', 'new', 'errors'}."""
+        queue = deque([(url, "sitemap") for url in sitemaps] + [(url, "listing") for url in listings])
+        visited = set()
+        stats = {"pages": 0, "found": 0, "new": 0, "errors": 0}
+        while queue and stats["pages"] < self.max_pages:
+            url, kind = queue.popleft()
+            if url in visited:
+                continue
+            visited.add(url)
+            try:
+                response = self._fetch(url)
+                if kind == "sitemap":
+                    book_urls, children = parse_sitemap(response.content)
+                    priority = SITEMAP_PRIORITY
+                else:
+                    book_urls, children = parse_listing_page(response.text, url)
+                    priority = LISTING_PRIORITY
+            # OSError (BadGzipFile), EOFError and zlib.error come from truncated or corrupt .gz sitemaps
+            except (requests.RequestException, etree.LxmlError, OSError, EOFError, zlib.error) as e:
+                self.logger.warning(f"Discovery failed for {url}: {str(e)}")
+                stats["errors"] += 1
+                continue
+
+            stats["pages"] += 1
+            stats["found"] += len(book_urls)
+            stats["new"] += self.frontier.add(book_urls, priority=priority, source=url)
+            queue.extend((child, kind) for child in children if child not in visited)
+            self.logger.info(f"{url}: {len(book_urls)} book URLs, {len(children)} more pages")
+        return stats
+
+    def close(self):
+        self._fetcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discover Packt book URLs into the scrape frontier.")
+    parser.add_argument("--sitemap", action="append", default=[], help="Sitemap or sitemap index URL")
+    parser.add_argument("--listing", action="append", default=[], help="Category or listing page URL")
+    parser.add_argument("--max-pages", type=int, default=500, help="Stop after fetching this many pages")
+    parser.add_argument("--rps", type=float, default=1.0, help="Requests per second")
+    parser.add_argument("--requeue-days", type=int, help="Also requeue books scraped more than N days ago")
+    args = parser.parse_args(argv)
+    if not args.sitemap and not args.listing and args.requeue_days is None:
+        parser.error("give at least one --sitemap or --listing seed")
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    db = ConnectionManager.from_env()
+    try:
+        frontier = Frontier(db)
+        if args.requeue_days is not None:
+            print(f"Requeued {frontier.requeue_stale(args.requeue_days)} stale URLs")
+        crawler = DiscoveryCrawler(frontier, requests_per_second=args.rps, max_pages=args.max_pages)
+        try:
+            stats = crawler.crawl(args.sitemap, args.listing)
+        finally:
+            crawler.close()
+    finally:
+        db.close()
+    print(f"Fetched {stats['pages']} pages ({stats['errors']} errors): "
+          f"{stats['found']} book URLs, {stats['new']} new to the frontier")
+
+
+if __name__ == "__main__":
+    main()
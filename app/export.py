@@ -0,0 +1,288 @@
+# export.py
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from psycopg2.extras import RealDictCursor
+from app.db import BOOK_COLUMNS, JSON_COLUMNS, prepare_updated_at
+
+EXPORT_COLUMNS = BOOK_COLUMNS + ["updated_at"]
+EXPORT_FORMATS = ("csv", "json", "parquet")
+STATE_FILE = "export_state.json"
+
+# updated_at is the writing transaction's start time, so a row can commit after newer rows were
+# already read. Incremental reads go back this far before the watermark; merges are by URL.
+WATERMARK_MARGIN = timedelta(minutes=5)
+
+PARQUET_SCHEMA = pa.schema([
+    ("title", pa.string()),
+    ("author", pa.string()),
+    ("original_price", pa.string()),
+    ("discounted_price", pa.string()),
+    ("rating", pa.float64()),
+    ("num_ratings", pa.int64()),
+    ("publication_date", pa.date32()),
+    ("pages", pa.int64()),
+    ("edition", pa.string()),
+    ("key_benefits", pa.string()),
+    ("description", pa.string()),
+    ("what_you_will_learn", pa.string()),
+    ("url", pa.string()),
+    ("original_price_cents", pa.int64()),
+    ("discounted_price_cents", pa.int64()),
+    ("currency", pa.string()),
+    ("updated_at", pa.timestamp("us", tz="UTC")),
+])
+
+
+def _json_list(value):
+    """List columns may come back as lists (json/jsonb) or as JSON text; always return JSON text."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class _CsvSink:
+    def __init__(self, f):
+        self.writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows({column: _json_list(row[column]) if column in JSON_COLUMNS else row[column]
+                               for column in EXPORT_COLUMNS} for row in rows)
+
+    def close(self):
+        pass
+
+
+class _JsonSink:
+    """Writes a JSON array with one record per line, so the file can be re-read line by line."""
+
+    def __init__(self, f):
+        self.f = f
+        self.first = True
+        f.write("[")
+
+    def write(self, rows):
+        for row in rows:
+            record = {column: row[column] for column in EXPORT_COLUMNS}
+            for column in JSON_COLUMNS:
+                if isinstance(record[column], str):
+                    record[column] = json.loads(record[column])
+            self.f.write(("\n" if self.first else ",\n") + json.dumps(record, default=_json_default))
+            self.first = False
+
+    def close(self):
+        self.f.write("\n]\n")
+
+
+def arrow_table(rows):
+    """Converts book rows (dicts) to an Arrow table with PARQUET_SCHEMA."""
+    columns = {column: [_json_list(row[column]) if column in JSON_COLUMNS else row[column] for row in rows]
+               for column in EXPORT_COLUMNS}
+    return pa.table(columns, schema=PARQUET_SCHEMA)
+
+
+class _ParquetSink:
+    def __init__(self, f):
+        self.writer = pq.ParquetWriter(f, PARQUET_SCHEMA)
+
+    def write(self, rows):
+        if not rows:
+            return
+        self.writer.write_table(arrow_table(rows))
+
+    def close(self):
+        self.writer.close()
+
+
+SINKS = {"csv": (_CsvSink, "w"), "json": (_JsonSink, "w"), "parquet": (_ParquetSink, "wb")}
+
+
+def _read_existing(path, export_format, chunk_size):
+    """Yields chunks of rows from a previous export, streaming so memory stays bounded."""
+    if export_format == "csv":
+        with open(path, newline="") as f:
+            chunk = []
+            for row in csv.DictReader(f):
+                chunk.append({column: (row.get(column) or None) for column in EXPORT_COLUMNS})
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            yield chunk
+    elif export_format == "json":
+        with open(path) as f:
+            chunk = []
+            for line in f:
+                line = line.strip().rstrip(",")
+                if line in ("[", "]", ""):
+                    continue
+                chunk.append(json.loads(line))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            yield chunk
+    else:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+
+
+class _AtomicFile:
+    """Writes to a temporary file in the target directory and renames it into place on success."""
+
+    def __init__(self, path, mode):
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        self.f = os.fdopen(fd, mode, **({"newline": ""} if "b" not in mode else {}))
+
+    def commit(self):
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.f.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def _load_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(directory, state):
+    target = _AtomicFile(os.path.join(directory, STATE_FILE), "w")
+    json.dump(state, target.f)
+    target.commit()
+
+
+def stream_books(conn, chunk_size, since=None):
+    """
+    Streams books from a server-side cursor, chunk by chunk. With `since`, only rows updated
+    after it, less WATERMARK_MARGIN, are read.
+    """
+    with conn.cursor(name="books_export", cursor_factory=RealDictCursor) as cur:
+        cur.itersize = chunk_size
+        query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM books"
+        if since:
+            cur.execute(query + " WHERE updated_at > %s::timestamptz - %s ORDER BY url", (since, WATERMARK_MARGIN))
+        else:
+            cur.execute(query + " ORDER BY url")
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def export_books(db, directory="data", basename="scraped_books", formats=EXPORT_FORMATS,
+                 incremental=False, chunk_size=5000):
+    """
+    Streams the books table to CSV, JSON and/or Parquet files in `directory`.
+
+    Rows are read from a server-side cursor and written chunk by chunk, so memory does not
+    grow with the table. Each file is written to a temporary file and renamed into place.
+    In incremental mode only rows whose updated_at is newer than the last export's watermark
+    are read from the database; the previous file is streamed through with those rows
+    replaced. Deleted books are only dropped by a full export.
+
+    Returns the number of rows read from the database.
+    """
+    os.makedirs(directory, exist_ok=True)
+    state = _load_state(directory)
+    paths = {export_format: os.path.join(directory, f"{basename}.{export_format}") for export_format in formats}
+    since = state.get("watermark") if incremental else None
+    if since and not all(os.path.exists(path) for path in paths.values()):
+        since = None
+
+    targets = {export_format: _AtomicFile(path, SINKS[export_format][1]) for export_format, path in paths.items()}
+    sinks = {export_format: SINKS[export_format][0](target.f) for export_format, target in targets.items()}
+    watermark = datetime.fromisoformat(since) if since else None
+    exported = 0
+    try:
+        with db.connection() as conn:
+            prepare_updated_at(conn)
+
+            changed_urls = set()
+            if since:
+                # Only the changed rows are held in memory; unchanged rows are copied from the old files
+                changed = [row for rows in stream_books(conn, chunk_size, since) for row in rows]
+                changed_urls = {row["url"] for row in changed}
+                for export_format, sink in sinks.items():
+                    for rows in _read_existing(paths[export_format], export_format, chunk_size):
+                        sink.write([row for row in rows if row["url"] not in changed_urls])
+                chunks = [changed] if changed else []
+            else:
+                chunks = stream_books(conn, chunk_size)
+
+            for rows in chunks:
+                for sink in sinks.values():
+                    sink.write(rows)
+                exported += len(rows)
+                latest = max(row["updated_at"] for row in rows)
+                watermark = max(watermark, latest) if watermark else latest
+            conn.rollback()
+
+        for export_format, sink in sinks.items():
+            sink.close()
+            targets[export_format].commit()
+    except Exception:
+        for target in targets.values():
+            target.abort()
+        raise
+
+    state["watermark"] = watermark.isoformat() if watermark else None
+    _save_state(directory, state)
+    logging.info(f"Exported {exported} books to {', '.join(paths.values())}")
+    return exported
+
+
+def stream_query_export(db, query, params, fileobj, export_format="csv", compress=False, chunk_size=2000):
+    """
+    Streams the rows of `query` into a binary file object as CSV or JSON Lines, optionally
+    gzip-compressed. Rows come from a server-side cursor, so the full result set is never held
+    in memory. Returns the number of rows written.
+    """
+    out = gzip.GzipFile(fileobj=fileobj, mode="wb") if compress else fileobj
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    written = 0
+    with db.connection() as conn, conn.cursor(name="query_export", cursor_factory=RealDictCursor) as cur:
+        cur.itersize = chunk_size
+        cur.execute(query, params)
+        writer = None
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            if export_format == "csv":
+                if writer is None:
+                    writer = csv.DictWriter(text, fieldnames=list(rows[0].keys()))
+                    writer.writeheader()
+                writer.writerows({k: _json_list(v) if k in JSON_COLUMNS else v for k, v in row.items()}
+                                 for row in rows)
+            else:
+                text.writelines(json.dumps(row, default=_json_default) + "\n" for row in rows)
+            written += len(rows)
+        conn.rollback()
+    text.flush()
+    text.detach()
+    if compress:
+        out.close()
+    return written
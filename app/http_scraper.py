@@ -0,0 +1,234 @@
+# http_scraper.py
+import logging
+import re
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import etree, html
+from app import metrics
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Fields that must be present in the server-rendered HTML, otherwise the Selenium path is used
+REQUIRED_FIELDS = {
+    'title': "Title not found",
+    'author': "Author not found",
+    'discounted_price': "Discounted price not found",
+}
+
+# Placeholder values written by the extractors when a section is missing from the page
+MISSING_PLACEHOLDERS = {
+    'title': {"Title not found"},
+    'author': {"Author not found"},
+    'original_price': {"Original price not found", "Price not found"},
+    'discounted_price': {"Discounted price not found", "Price not found"},
+    'rating': {"Rating not found"},
+    'pages': {"Pages not specified"},
+    'edition': {"Edition not specified"},
+    'publication_date': {"Publication date not found"},
+    'key_benefits': {"No key benefits found"},
+    'description': {"Description not found"},
+    'what_you_will_learn': {"No information found"},
+}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Selectors mirror the locators used by BookScraper._extract_book_details and are compiled once
+TITLE_XPATH = etree.XPath(f"//*[{_has_class('product-title')}]")
+AUTHORS_XPATH = etree.XPath("//div[contains(@class, 'authors')]/span[not(@class)]")
+PRICE_XPATH = etree.XPath(f"//*[{_has_class('product-details-price')}]")
+ORIGINAL_PRICE_XPATH = etree.XPath(".//del")
+DISCOUNTED_PRICE_XPATH = etree.XPath(".//span[contains(@class, 'fw-600')]")
+RATING_XPATH = etree.XPath(f"//*[{_has_class('star-rating-total-rating-medium')}]")
+NUM_RATINGS_XPATH = etree.XPath(f"//*[{_has_class('star-rating-total-count')}]")
+META_XPATH = etree.XPath(f"//*[{_has_class('product-meta')} and {_has_class('product-details-information')}]//span")
+KEY_BENEFITS_XPATH = etree.XPath("//h2[contains(text(), 'Key benefits')]/following-sibling::ul[1]/li")
+DESCRIPTION_XPATH = etree.XPath("//h2[contains(text(), 'Description')]/following-sibling::div[1]")
+WHAT_YOU_WILL_LEARN_XPATH = etree.XPath("//h2[contains(text(), 'What you will learn')]/following-sibling::ul[1]/li")
+
+
+def _text(element):
+    return WHITESPACE_PATTERN.sub(' ', ''.join(element.itertext())).strip()
+
+
+def _first_text(context, xpath):
+    elements = xpath(context)
+    return _text(elements[0]) if elements else None
+
+
+def parse_book_html(page_html):
+    """
+    Extracts book details from a server-rendered Packt book page.
+    Returns the same dict shape as BookScraper._extract_book_details.
+    """
+    tree = html.fromstring(page_html)
+    book_details = {}
+
+    # Extract Title
+    book_details['title'] = _first_text(tree, TITLE_XPATH) or "Title not found"
+
+    # Extract Author
+    author_names = [_text(author) for author in AUTHORS_XPATH(tree)]
+    book_details['author'] = ", ".join(filter(None, author_names)) or "Author not found"
+
+    # Extract Prices
+    price_elements = PRICE_XPATH(tree)
+    if price_elements:
+        price_element = price_elements[0]
+        book_details['original_price'] = _first_text(price_element, ORIGINAL_PRICE_XPATH) or "Original price not found"
+        book_details['discounted_price'] = _first_text(price_element,
+                                                       DISCOUNTED_PRICE_XPATH) or "Discounted price not found"
+    else:
+        book_details['original_price'] = book_details['discounted_price'] = "Price not found"
+
+    # Extract Rating
+    book_details['rating'] = _first_text(tree, RATING_XPATH) or "Rating not found"
+
+    # Extract Number of Ratings
+    num_ratings_text = (_first_text(tree, NUM_RATINGS_XPATH) or '').strip('()')
+    book_details['num_ratings'] = num_ratings_text if num_ratings_text else "0"
+
+    # Extract additional details
+    for item in META_XPATH(tree):
+        text = _text(item)
+        if 'pages' in text.lower():
+            book_details['pages'] = text.split()[0]
+        elif 'edition' in text.lower():
+            book_details['edition'] = text
+        elif any(month in text for month in MONTHS):
+            book_details['publication_date'] = text
+
+    # Set default values if not found
+    book_details.setdefault('pages', "Pages not specified")
+    book_details.setdefault('edition', "Edition not specified")
+    book_details.setdefault('publication_date', "Publication date not found")
+
+    # Extract Key Benefits
+    key_benefits = [_text(benefit) for benefit in KEY_BENEFITS_XPATH(tree)]
+    book_details['key_benefits'] = key_benefits or ["No key benefits found"]
+
+    # Extract Description
+    book_details['description'] = _first_text(tree, DESCRIPTION_XPATH) or "Description not found"
+
+    # Extract What You Will Learn
+    what_you_will_learn = [_text(item) for item in WHAT_YOU_WILL_LEARN_XPATH(tree)]
+    book_details['what_you_will_learn'] = what_you_will_learn or ["No information found"]
+
+    return book_details
+
+
+def record_missing_fields(book_details, source):
+    """Counts every field that came back as a placeholder in missing_fields_total."""
+    for field, placeholders in MISSING_PLACEHOLDERS.items():
+        value = book_details.get(field)
+        if isinstance(value, list):
+            value = value[0] if len(value) == 1 else None
+        if value in placeholders:
+            metrics.inc("missing_fields_total", field=field, source=source)
+
+
+def missing_required_fields(book_details):
+    """Returns the required fields that the HTML did not contain."""
+    missing = []
+    for field, placeholder in REQUIRED_FIELDS.items():
+        if book_details.get(field) in (None, "", placeholder, "Price not found"):
+            missing.append(field)
+    return missing
+
+
+class HttpBookFetcher:
+    """Fetches book pages over a pooled HTTP session, without a browser."""
+
+    def __init__(self, pool_size=2, timeout=15, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.logger = logging.getLogger(__name__)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                          "Chrome/128.0 Safari/537.36",
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Language": "en-US,en;q=0.9",
+        })
+
+    def fetch(self, book_url):
+        if not self.cache:
+            response = self.session.get(book_url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.text
+
+        # Revalidate stale cache entries with their validators so unchanged pages come back as 304
+        entry = self.cache.get(book_url)
+        headers = {}
+        if entry:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.session.get(book_url, timeout=self.timeout, headers=headers)
+        if entry and response.status_code == 304:
+            self.cache.touch(book_url)
+            return entry.html
+        response.raise_for_status()
+        self.cache.put(book_url, response.text, etag=response.headers.get("ETag"),
+                       last_modified=response.headers.get("Last-Modified"))
+        return response.text
+
+    def scrape_book_details(self, book_url):
+        """
+        Returns the parsed book details, or None when the page could not be fetched
+        or is missing required fields and needs the Selenium path.
+        """
+        try:
+            with metrics.timer("http_fetch"):
+                page_html = self.fetch(book_url)
+        except requests.RequestException as e:
+            self.logger.warning(f"HTTP fetch failed for {book_url}: {str(e)}")
+            return None
+
+        return self._parse(book_url, page_html)
+
+    def scrape_cached_book_details(self, book_url):
+        """Returns book details from a fresh cache entry without touching the network, or None."""
+        if not self.cache:
+            return None
+        entry = self.cache.get(book_url)
+        if not entry or not entry.fresh:
+            return None
+        return self._parse(book_url, entry.html)
+
+    def _parse(self, book_url, page_html):
+        try:
+            with metrics.timer("http_parse"):
+                book_details = parse_book_html(page_html)
+        except (etree.LxmlError, ValueError) as e:
+            # e.g. an empty 200 response or cache entry; the Selenium path gets a chance instead
+            self.logger.warning(f"Could not parse the page for {book_url}: {str(e)}")
+            return None
+        record_missing_fields(book_details, "http")
+        missing = missing_required_fields(book_details)
+        if missing:
+            self.logger.info(f"Page for {book_url} is missing {', '.join(missing)}")
+            return None
+
+        book_details['url'] = book_url
+        return book_details
+
+    def close(self):
+        self.session.close()
+
+
+def replay_cached_pages(cache):
+    """Re-runs extraction over every page in the cache, e.g. after the selectors change."""
+    for url, page_html in cache.entries():
+        book_details = parse_book_html(page_html)
+        book_details['url'] = url
+        yield book_details
@@ -0,0 +1,314 @@
+# jobs.py
+"""
+Postgres-backed scrape job queue, so any number of worker processes on any number of
+machines can share one backlog of URLs.
+
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED and hold them under a lease that
+a heartbeat keeps extending; jobs whose lease ran out (a crashed or stuck worker) are put
+back in the queue. Failed jobs are retried with backoff and dead-lettered after max_attempts.
+
+Usage: python -m app.jobs enqueue urls.txt
+       python -m app.jobs work --workers 4 [--exit-when-empty]
+       python -m app.jobs status
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from app import metrics
+from app.cache import PageCache
+from app.cli import read_urls
+from app.db import ConnectionManager
+from app.pipeline import process_urls
+from app.scraper import BookScraper
+from app.snapshot import refresh_snapshot
+
+JOB_STATUSES = ("queued", "running", "done", "dead")
+
+
+def ensure_jobs_schema(db_conn):
+    """
+    Creates the scrape_jobs table. Partial indexes keep claiming and lease reaping cheap
+    however many finished jobs the table accumulates.
+    """
+    with db_conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            available_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            leased_by TEXT,
+            lease_expires_at TIMESTAMPTZ,
+            last_error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            finished_at TIMESTAMPTZ
+        )
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS scrape_jobs_queued_idx
+        ON scrape_jobs (available_at) WHERE status = 'queued'
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS scrape_jobs_running_idx
+        ON scrape_jobs (lease_expires_at) WHERE status = 'running'
+        """)
+    db_conn.commit()
+
+
+class JobQueue:
+    """
+    Scrape jobs stored in Postgres. Every method runs in its own short transaction,
+    so the queue is safe to share between threads, processes and machines.
+    """
+
+    def __init__(self, db, lease_seconds=120, max_attempts=3, retry_delay=30):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.logger = logging.getLogger(__name__)
+        with db.connection() as conn:
+            ensure_jobs_schema(conn)
+
+    def _execute(self, query, params, fetch=False):
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall() if fetch else cur.rowcount
+            conn.commit()
+        return rows
+
+    def enqueue(self, urls):
+        """
+        Queues URLs, returning how many were added or re-queued.
+        URLs already queued or running are left alone; finished and dead jobs start over.
+        """
+        rows = [(url, self.max_attempts) for url in dict.fromkeys(urls)]
+        if not rows:
+            return 0
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                returned = execute_values(cur, """
+                INSERT INTO scrape_jobs (url, max_attempts) VALUES %s
+                ON CONFLICT (url) DO UPDATE SET
+                    status = 'queued', attempts = 0, available_at = now(), last_error = NULL,
+                    leased_by = NULL, lease_expires_at = NULL, finished_at = NULL,
+                    max_attempts = EXCLUDED.max_attempts
+                WHERE scrape_jobs.status IN ('done', 'dead')
+                RETURNING id
+                """, rows, page_size=1000, fetch=True)
+            conn.commit()
+        return len(returned)
+
+    def claim(self, worker_id, limit):
+        """Leases up to `limit` queued jobs to `worker_id`. Returns [(id, url, attempt)]."""
+        return self._execute("""
+        UPDATE scrape_jobs SET
+            status = 'running', attempts = attempts + 1, leased_by = %s,
+            lease_expires_at = now() + make_interval(secs => %s)
+        WHERE id IN (
+            SELECT id FROM scrape_jobs
+            WHERE status = 'queued' AND available_at <= now()
+            ORDER BY available_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, url, attempts
+        """, (worker_id, self.lease_seconds, limit), fetch=True)
+
+    def heartbeat(self, worker_id, job_ids):
+        """Extends the lease on jobs still held by `worker_id`. Returns how many were extended."""
+        return self._execute("""
+        UPDATE scrape_jobs SET lease_expires_at = now() + make_interval(secs => %s)
+        WHERE id = ANY(%s) AND status = 'running' AND leased_by = %s
+        """, (self.lease_seconds, list(job_ids), worker_id))
+
+    def complete(self, worker_id, job_ids):
+        """Marks jobs done; jobs whose lease was lost to another worker are left to that worker."""
+        if not job_ids:
+            return 0
+        return self._execute("""
+        UPDATE scrape_jobs SET status = 'done', finished_at = now(), leased_by = NULL,
+            lease_expires_at = NULL, last_error = NULL
+        WHERE id = ANY(%s) AND status = 'running' AND leased_by = %s
+        """, (list(job_ids), worker_id))
+
+    def fail(self, worker_id, job_ids, error, retry=True):
+        """
+        Records a failed attempt. Jobs are re-queued with exponential backoff until they reach
+        max_attempts, or immediately dead-lettered when `retry` is False.
+        """
+        if not job_ids:
+            return 0
+        return self._execute("""
+        UPDATE scrape_jobs SET
+            status = CASE WHEN %s AND attempts < max_attempts THEN 'queued' ELSE 'dead' END,
+            available_at = now() + make_interval(secs => %s * power(2, attempts - 1)),
+            finished_at = CASE WHEN %s AND attempts < max_attempts THEN NULL ELSE now() END,
+            leased_by = NULL, lease_expires_at = NULL, last_error = %s
+        WHERE id = ANY(%s) AND status = 'running' AND leased_by = %s
+        """, (retry, self.retry_delay, retry, error, list(job_ids), worker_id))
+
+    def reap_expired(self):
+        """
+        Returns jobs whose lease expired to the queue. The crashed attempt still counts,
+        so a page that keeps killing workers ends up dead-lettered.
+        """
+        reaped = self._execute("""
+        UPDATE scrape_jobs SET
+            status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'dead' END,
+            finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE now() END,
+            available_at = now(), leased_by = NULL, lease_expires_at = NULL,
+            last_error = 'Lease expired'
+        WHERE id IN (
+            SELECT id FROM scrape_jobs
+            WHERE status = 'running' AND lease_expires_at < now()
+            FOR UPDATE SKIP LOCKED
+        )
+        """, ())
+        if reaped:
+            self.logger.warning(f"Reclaimed {reaped} jobs with expired leases")
+        return reaped
+
+    def counts(self):
+        """Returns the number of jobs in each status."""
+        rows = self._execute("SELECT status, count(*) FROM scrape_jobs GROUP BY status", (), fetch=True)
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+
+async def _heartbeat(queue, worker_id, job_ids, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(queue.heartbeat, worker_id, job_ids)
+        except Exception as e:
+            logging.warning(f"Heartbeat failed for worker {worker_id}: {str(e)}")
+
+
+async def run_worker(db, worker_id, batch_size=10, poll_interval=5.0, exit_when_empty=False,
+                     max_concurrency=2, requests_per_second=1.0, lease_seconds=120, max_attempts=3,
+                     metrics_file=None):
+    """
+    Claims and scrapes jobs until stopped (or until the queue is empty, with `exit_when_empty`).
+    Returns the number of jobs this worker completed.
+    """
+    queue = JobQueue(db, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    completed = 0
+    async with BookScraper(headless=True, max_concurrency=max_concurrency,
+                           requests_per_second=requests_per_second, cache=PageCache()) as scraper:
+        while True:
+            await asyncio.to_thread(queue.reap_expired)
+            jobs = await asyncio.to_thread(queue.claim, worker_id, batch_size)
+            if not jobs:
+                if exit_when_empty:
+                    counts = await asyncio.to_thread(queue.counts)
+                    if not counts["queued"] and not counts["running"]:
+                        return completed
+                await asyncio.sleep(poll_interval)
+                continue
+
+            job_ids = {url: job_id for job_id, url, _ in jobs}
+            heartbeat = asyncio.create_task(_heartbeat(queue, worker_id, list(job_ids.values()), lease_seconds / 3))
+            try:
+                outcome = await process_urls(scraper, list(job_ids), db)
+            except Exception as e:
+                # Hand the batch back for a retry instead of taking the worker down
+                logging.exception(f"Worker {worker_id}: batch of {len(jobs)} jobs failed")
+                await asyncio.to_thread(queue.fail, worker_id, job_ids.values(), str(e))
+                continue
+            finally:
+                heartbeat.cancel()
+
+            if outcome['db_error']:
+                await asyncio.to_thread(queue.fail, worker_id, job_ids.values(), outcome['db_error'])
+                continue
+            done = [job_ids[book['url']] for book in outcome['books']]
+            await asyncio.to_thread(queue.complete, worker_id, done)
+            await asyncio.to_thread(queue.fail, worker_id, [job_ids[url] for url in outcome['failed']],
+                                    "Scrape failed")
+            # Invalid URLs and pages that fail validation will not get better on retry
+            await asyncio.to_thread(queue.fail, worker_id, [job_ids[url] for url in outcome['invalid']],
+                                    "Invalid URL", False)
+            await asyncio.to_thread(queue.fail, worker_id, [job_ids[url] for url in outcome['rejected']],
+                                    "Failed validation", False)
+            completed += len(done)
+            logging.info(f"Worker {worker_id}: {len(done)} of {len(jobs)} jobs done ({completed} total)")
+            if outcome['inserted'] or outcome['updated']:
+                try:
+                    # Incremental: only the rows changed since the last refresh are read
+                    await asyncio.to_thread(refresh_snapshot, db)
+                except Exception as e:
+                    logging.error(f"Worker {worker_id}: failed to refresh the catalog snapshot: {str(e)}")
+            if metrics_file:
+                metrics.REGISTRY.write_prometheus(metrics_file)
+
+
+def _worker_process(args):
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(process)d - %(levelname)s - %(message)s")
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    db = ConnectionManager.from_env(max_size=4)
+    metrics_file = os.path.join(args.metrics_dir, f"worker-{os.getpid()}.prom") if args.metrics_dir else None
+    try:
+        return asyncio.run(run_worker(db, worker_id, batch_size=args.batch_size, exit_when_empty=args.exit_when_empty,
+                                      max_concurrency=args.concurrency, requests_per_second=args.rps,
+                                      lease_seconds=args.lease, max_attempts=args.max_attempts,
+                                      metrics_file=metrics_file))
+    except KeyboardInterrupt:
+        # Leased jobs are reclaimed by another worker once the lease runs out
+        return 0
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed scraping through a Postgres job queue.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="Queue URLs from a file, or - for stdin")
+    enqueue.add_argument("source")
+    enqueue.add_argument("--max-attempts", type=int, default=3)
+    work = commands.add_parser("work", help="Run worker processes")
+    work.add_argument("--workers", type=int, default=1, help="Worker processes to start on this machine")
+    work.add_argument("--batch-size", type=int, default=10, help="Jobs claimed at a time")
+    work.add_argument("--concurrency", type=int, default=2, help="Pages scraped in parallel per worker")
+    work.add_argument("--rps", type=float, default=1.0, help="Requests per second per host per worker")
+    work.add_argument("--lease", type=int, default=120, help="Lease length in seconds")
+    work.add_argument("--max-attempts", type=int, default=3)
+    work.add_argument("--metrics-dir", help="Write each worker's Prometheus metrics file here")
+    work.add_argument("--exit-when-empty", action="store_true", help="Stop once no jobs are queued or running")
+    commands.add_parser("status", help="Show job counts by status")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.command == "work":
+        started = time.monotonic()
+        with multiprocessing.Pool(args.workers) as pool:
+            completed = sum(pool.map(_worker_process, [args] * args.workers))
+        print(f"{completed} jobs completed in {time.monotonic() - started:.1f}s")
+        return
+
+    db = ConnectionManager.from_env()
+    try:
+        if args.command == "enqueue":
+            queue = JobQueue(db, max_attempts=args.max_attempts)
+            print(f"Queued {queue.enqueue(read_urls(args.source))} jobs")
+        else:
+            for status, count in JobQueue(db).counts().items():
+                print(f"{status:<8} {count}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
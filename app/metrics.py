@@ -0,0 +1,213 @@
+# metrics.py
+"""
+Low-overhead in-process metrics: stage timings, counters and gauges.
+
+Everything is recorded into the module-level REGISTRY and can be rendered in the Prometheus
+text format (written to a file for the node exporter's textfile collector, or served over HTTP)
+or summarized for the Streamlit diagnostics page.
+"""
+import bisect
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the Prometheus histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus, plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1000):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self):
+        samples = sorted(self.recent)
+        if not samples:
+            return {q: None for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters, gauges and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name, amount, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Records the duration of the block in the stage_duration_seconds histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    @contextmanager
+    def in_flight(self, name, **labels):
+        """Counts the block in a gauge while it runs."""
+        self.add_gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, list(h.counts), h.total, h.count, h.buckets)
+                                for key, h in self._histograms.items())
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, key), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), value in gauges:
+            declare(name, "gauge")
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), counts, total, count, buckets in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically writes the metrics file, e.g. for the node exporter textfile collector."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """Returns (timings, counters, gauges) as lists of dicts for display."""
+        with self._lock:
+            timings = []
+            for (name, key), histogram in sorted(self._histograms.items()):
+                quantiles = histogram.quantiles()
+                timings.append({
+                    "metric": name, **dict(key), "count": histogram.count,
+                    "mean_ms": histogram.total / histogram.count * 1000 if histogram.count else None,
+                    **{f"p{int(q * 100)}_ms": value * 1000 if value is not None else None
+                       for q, value in quantiles.items()},
+                })
+            counters = [{"metric": name, **dict(key), "value": value}
+                        for (name, key), value in sorted(self._counters.items())]
+            gauges = [{"metric": name, **dict(key), "value": value}
+                      for (name, key), value in sorted(self._gauges.items())]
+        return timings, counters, gauges
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("stage_duration_seconds", "Time spent in each scraping stage")
+REGISTRY.describe("pages_scraped_total", "Pages scraped, by the source that produced them")
+REGISTRY.describe("scrape_retries_total", "Browser scrape attempts that failed and were retried")
+REGISTRY.describe("scrape_failures_total", "URLs that could not be scraped")
+REGISTRY.describe("page_load_timeouts_total", "Pages not ready before their timeout, by what they waited on")
+REGISTRY.describe("browser_bytes_total", "Bytes received over the network by browser page loads")
+REGISTRY.describe("missing_fields_total", "Extracted pages missing a field, by field")
+REGISTRY.describe("pages_in_flight", "Pages currently being scraped")
+
+timer = REGISTRY.timer
+inc = REGISTRY.inc
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serves /metrics from a daemon thread. Returns the server so callers can shut it down."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
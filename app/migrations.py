@@ -0,0 +1,140 @@
+# migrations.py
+"""
+One-off migration of books rows written before the upsert, the typed columns and search existed:
+removes duplicate URLs, converts legacy text columns in place, backfills the typed prices and
+the search vectors, and builds the search indexes. The writer refuses to start until this has run.
+
+Run with: python -m app.migrations
+"""
+import logging
+from dotenv import load_dotenv
+from app.db import (SEARCH_INDEXES, TYPED_COLUMNS, ConnectionManager, ensure_search_schema, ensure_typed_columns,
+                    ensure_url_index, legacy_typed_columns)
+
+PRICE_CENTS_EXPR = ("round(NULLIF(substring(replace({column}, ',', '') from '[0-9]+\\.?[0-9]*'), '')::numeric * 100)"
+                    "::integer")
+
+
+def dedupe_books(db_conn):
+    """
+    Deletes rows sharing a URL with another, keeping the most recently updated one (the
+    physically last one for tables without updated_at). Every deleted row is logged. Returns rows deleted.
+    """
+    with db_conn.cursor() as cur:
+        cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'books' AND column_name = 'updated_at'
+        """)
+        recency = "updated_at DESC, ctid DESC" if cur.fetchone() else "ctid DESC"
+        cur.execute(f"""
+        DELETE FROM books WHERE ctid IN (
+            SELECT ctid FROM (
+                SELECT ctid, row_number() OVER (PARTITION BY url ORDER BY {recency}) AS duplicate
+                FROM books
+            ) ranked
+            WHERE duplicate > 1
+        )
+        RETURNING url, title
+        """)
+        deleted = cur.fetchall()
+    db_conn.commit()
+    for url, title in deleted:
+        logging.warning(f"Deleted duplicate row for {url} ({title})")
+    return len(deleted)
+
+
+def convert_legacy_columns(db_conn):
+    """Converts typed columns still stored as text in place. Rewrites the table under an exclusive lock."""
+    legacy = legacy_typed_columns(db_conn)
+    with db_conn.cursor() as cur:
+        for column in legacy:
+            column_type, using = TYPED_COLUMNS[column]
+            logging.info(f"Converting books.{column} to {column_type}")
+            cur.execute(f"ALTER TABLE books ALTER COLUMN {column} TYPE {column_type} USING {using}")
+    db_conn.commit()
+    return legacy
+
+
+def backfill_typed_columns(db_conn, batch_size=5000):
+    """
+    Fills the price cents for existing rows in batches. Returns rows updated.
+
+    currency is left NULL: legacy price strings were all rewritten with a "$" prefix whatever
+    the real currency, so it cannot be recovered here; the next scrape of each book fills it in.
+    """
+    ensure_typed_columns(db_conn)
+    total = 0
+    while True:
+        with db_conn.cursor() as cur:
+            cur.execute(f"""
+            UPDATE books SET
+                original_price_cents = {PRICE_CENTS_EXPR.format(column='original_price')},
+                discounted_price_cents = {PRICE_CENTS_EXPR.format(column='discounted_price')}
+            WHERE ctid IN (
+                SELECT ctid FROM books
+                WHERE original_price_cents IS NULL AND discounted_price_cents IS NULL AND currency IS NULL
+                  AND (discounted_price ~ '[0-9]' OR original_price ~ '[0-9]')
+                LIMIT {batch_size}
+            )
+            """)
+            updated = cur.rowcount
+        db_conn.commit()
+        total += updated
+        logging.info(f"Backfilled typed prices for {total} books")
+        if updated < batch_size:
+            return total
+
+
+def build_search_indexes(db_conn, batch_size=5000):
+    """
+    Fills search_vector for rows written before the search trigger existed, in batches, then
+    builds the search indexes CONCURRENTLY so reads and writes continue. Returns rows backfilled.
+    """
+    ensure_search_schema(db_conn)
+    total = 0
+    while True:
+        with db_conn.cursor() as cur:
+            # Setting title fires the trigger, which computes the vector
+            cur.execute(f"""
+            UPDATE books SET title = title
+            WHERE ctid IN (SELECT ctid FROM books WHERE search_vector IS NULL LIMIT {batch_size})
+            """)
+            updated = cur.rowcount
+        db_conn.commit()
+        total += updated
+        logging.info(f"Backfilled search vectors for {total} books")
+        if updated < batch_size:
+            break
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    db_conn.autocommit = True
+    try:
+        with db_conn.cursor() as cur:
+            # An interrupted concurrent build leaves an invalid index that IF NOT EXISTS would keep
+            cur.execute("""
+            SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+            """, (list(SEARCH_INDEXES),))
+            for (name,) in cur.fetchall():
+                cur.execute(f"DROP INDEX CONCURRENTLY {name}")
+            for name, definition in SEARCH_INDEXES.items():
+                logging.info(f"Building {name}")
+                cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+    finally:
+        db_conn.autocommit = False
+    return total
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    # Rewriting a large table can take longer than the app's statement timeout
+    db = ConnectionManager.from_env(statement_timeout_ms=0)
+    with db.connection() as conn:
+        print(f"Removed {dedupe_books(conn)} duplicate books")
+        ensure_url_index(conn)
+        converted = convert_legacy_columns(conn)
+        print(f"Converted {', '.join(converted) if converted else 'no'} legacy columns")
+        print(f"Backfilled {backfill_typed_columns(conn)} books")
+        print(f"Backfilled search vectors for {build_search_indexes(conn)} books")
+    db.close()
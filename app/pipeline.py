@@ -0,0 +1,155 @@
+# pipeline.py
+import asyncio
+import contextlib
+import logging
+from app import metrics
+from app.db import BookWriter
+from app.utils import clean_and_validate_books, validate_url
+
+# Event types that mark one URL as finished, for progress reporting
+URL_EVENTS = ('book', 'invalid', 'failed', 'rejected')
+
+_DONE = object()
+
+
+async def _scrape_and_clean(scraper, urls, events, records):
+    """Validates, scrapes and cleans URLs, emitting an event per URL as soon as it finishes."""
+    try:
+        valid_urls = []
+        for url in urls:
+            if validate_url(url):
+                valid_urls.append(url)
+            else:
+                logging.warning(f"Invalid URL: {url}")
+                await events.put({'type': 'invalid', 'url': url})
+
+        async for url, result in scraper.iter_books(valid_urls):
+            if not result:
+                await events.put({'type': 'failed', 'url': url})
+                continue
+            # Add the URL as a unique identifier
+            result['url'] = url
+            with metrics.timer("clean"):
+                cleaned, errors = clean_and_validate_books([result])
+            if errors:
+                await events.put({'type': 'rejected', 'url': url, 'error': errors[0]['error']})
+                continue
+            await events.put({'type': 'book', 'url': url, 'book': cleaned[0]})
+            if records is not None:
+                await records.put(cleaned[0])
+    finally:
+        if records is not None:
+            await records.put(None)
+        await events.put(_DONE)
+
+
+@contextlib.asynccontextmanager
+async def _checkout(db):
+    """
+    Checks out a pooled connection in a worker thread: waiting for a pool slot, connecting and
+    the liveness probe all block, and must not stall the scrapes sharing the event loop.
+    """
+    connection = db.connection()
+    entering = asyncio.ensure_future(asyncio.to_thread(connection.__enter__))
+    try:
+        conn = await asyncio.shield(entering)
+    except asyncio.CancelledError:
+        # The checkout still completes in its thread; hand the connection back once it does
+        entering.add_done_callback(lambda f: f.cancelled() or f.exception() or connection.__exit__(None, None, None))
+        raise
+    try:
+        yield conn
+    except BaseException as e:
+        if not await asyncio.to_thread(connection.__exit__, type(e), e, e.__traceback__):
+            raise
+    else:
+        await asyncio.to_thread(connection.__exit__, None, None, None)
+
+
+async def _write_books(db, records, events, batch_size, flush_interval):
+    """
+    Background writer stage: upserts cleaned records in batches while scraping continues,
+    flushing whenever a batch fills up or no record arrived for `flush_interval` seconds.
+    """
+    async def write(func, *args):
+        with metrics.timer("db_write"):
+            batch = await asyncio.to_thread(func, *args)
+        for status in ('inserted', 'updated', 'unchanged'):
+            for url in (batch or {}).get(status, []):
+                await events.put({'type': 'stored', 'url': url, 'status': status})
+
+    try:
+        async with _checkout(db) as conn:
+            writer = await asyncio.to_thread(BookWriter, conn, batch_size, flush_interval)
+            while True:
+                try:
+                    book = await asyncio.wait_for(records.get(), timeout=flush_interval)
+                except asyncio.TimeoutError:
+                    await write(writer.flush)
+                    continue
+                if book is None:
+                    await write(writer.flush)
+                    break
+                await write(writer.add, book)
+    except Exception as e:
+        logging.error(f"Failed to store/update books in the database: {str(e)}")
+        await events.put({'type': 'db_error', 'error': str(e)})
+    finally:
+        await events.put(_DONE)
+
+
+async def stream_urls(scraper, urls, db=None, batch_size=100, flush_interval=2.0):
+    """
+    Scrapes, cleans and persists URLs with an already-open BookScraper, yielding events as
+    they happen instead of after the whole batch:
+
+    - {'type': 'book', 'url', 'book'}: a page was scraped and cleaned
+    - {'type': 'invalid' | 'failed' | 'rejected', 'url'}: a URL was dropped
+    - {'type': 'stored', 'url', 'status'}: a book was inserted, updated or found unchanged
+    - {'type': 'db_error', 'error'}: persisting failed; no further 'stored' events follow
+
+    Cleaned records go to a background writer as soon as they are ready, so database
+    writes overlap with scraping.
+    """
+    events = asyncio.Queue()
+    records = asyncio.Queue() if db else None
+    tasks = [asyncio.create_task(_scrape_and_clean(scraper, urls, events, records))]
+    if db:
+        tasks.append(asyncio.create_task(_write_books(db, records, events, batch_size, flush_interval)))
+
+    try:
+        running = len(tasks)
+        while running:
+            event = await events.get()
+            if event is _DONE:
+                running -= 1
+                continue
+            yield event
+        # Re-raise anything the stages failed with
+        for task in tasks:
+            await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def process_urls(scraper, urls, db=None, batch_size=100):
+    """
+    Scrapes, cleans and persists one batch of URLs with an already-open BookScraper.
+
+    Returns a dict of outcomes: the cleaned records, plus the URLs that were invalid,
+    failed to scrape, were rejected by validation, inserted, updated or left unchanged. If persisting fails,
+    'db_error' holds the error message and none of the cleaned records count as stored.
+    """
+    outcome = {'books': [], 'invalid': [], 'failed': [], 'rejected': [], 'inserted': [], 'updated': [],
+               'unchanged': [], 'db_error': None}
+    async for event in stream_urls(scraper, urls, db, batch_size=batch_size):
+        if event['type'] == 'book':
+            outcome['books'].append(event['book'])
+        elif event['type'] == 'stored':
+            outcome[event['status']].append(event['url'])
+        elif event['type'] == 'db_error':
+            outcome['db_error'] = event['error']
+        else:
+            outcome[event['type']].append(event['url'])
+    return outcome
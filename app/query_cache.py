@@ -0,0 +1,165 @@
+# query_cache.py
+import json
+import logging
+import pickle
+import select
+import threading
+import time
+from collections import OrderedDict
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+from app import metrics
+from app.db import BOOKS_CHANGED_CHANNEL, ensure_books_version, get_books_version
+
+# NAT gateways and proxies silently drop idle connections, so the LISTEN connection uses TCP
+# keepalives and is probed every LISTEN_PROBE_SECONDS
+LISTEN_KEEPALIVE_PARAMS = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3}
+LISTEN_PROBE_SECONDS = 30.0
+
+
+def _cache_key(query, params):
+    normalized = " ".join(query.split())
+    return normalized, json.dumps(params, sort_keys=True, default=str)
+
+
+class QueryCache:
+    """
+    Process-wide cache of query results over the books table, shared by every session.
+
+    Entries are evicted least recently used first once their pickled size exceeds `max_bytes`.
+    The whole cache is dropped whenever books changes: a background connection LISTENs for the
+    notification sent by the books_version trigger, so viewers cost no queries between changes.
+    While that listener is down, each lookup compares books_version instead.
+    """
+
+    def __init__(self, db, max_bytes=64 * 1024 * 1024, reconnect_delay=5.0):
+        self.db = db
+        self.max_bytes = max_bytes
+        self.reconnect_delay = reconnect_delay
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Bumped on every invalidation; results computed under an older generation are not stored
+        self._generation = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._listening = False
+        self._closed = threading.Event()
+        with db.connection() as conn:
+            ensure_books_version(conn)
+        self._listener = threading.Thread(target=self._listen, name="query-cache-listener", daemon=True)
+        self._listener.start()
+
+    def fetch(self, query, params=None, timeout_ms=None):
+        """
+        Returns the rows of `query` as a list of dicts, from the cache when possible.
+        A miss gives up after `timeout_ms` if set, so callers can fall back instead of waiting.
+        """
+        key = _cache_key(query, params)
+        if not self._listening:
+            self._check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.inc("query_cache_total", result="hit")
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+        metrics.inc("query_cache_total", result="miss")
+
+        with self.db.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if timeout_ms:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+            cur.execute(query, params)
+            result = [dict(row) for row in cur.fetchall()]
+            conn.rollback()
+        self._store(key, result, generation)
+        return result
+
+    def _store(self, key, result, generation):
+        size = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                metrics.inc("query_cache_evictions_total")
+            self._update_gauges()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.REGISTRY.set_gauge("query_cache_entries", len(self._entries))
+        metrics.REGISTRY.set_gauge("query_cache_bytes", self._bytes)
+
+    def _check_version(self):
+        with self.db.connection() as conn:
+            version = get_books_version(conn)
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def _listen(self):
+        while not self._closed.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**{**self.db.connect_params, **LISTEN_KEEPALIVE_PARAMS})
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {BOOKS_CHANGED_CHANNEL}")
+                self._listening = True
+                # Changes made while nobody was listening are unknown, so start clean
+                self.invalidate()
+                self._version = get_books_version(conn)
+                last_probe = time.monotonic()
+                while not self._closed.is_set():
+                    if time.monotonic() - last_probe >= LISTEN_PROBE_SECONDS:
+                        # Fails on a dead connection, and catches any notification that was lost
+                        self._probe(conn)
+                        last_probe = time.monotonic()
+                    elif select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    else:
+                        conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self.invalidate()
+            except (psycopg2.Error, OSError) as e:
+                self.logger.warning(f"Query cache listener disconnected: {str(e)}")
+            finally:
+                self._listening = False
+                if conn is not None:
+                    conn.close()
+            self._closed.wait(self.reconnect_delay)
+
+    def _probe(self, conn):
+        version = get_books_version(conn)
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'bytes': self._bytes, 'listening': self._listening}
+
+    def close(self):
+        self._closed.set()
+        self._listener.join()
@@ -1,110 +1,473 @@
 import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from functools import lru_cache
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import WebDriverException, TimeoutException, NoSuchElementException
+from selenium.common.exceptions import WebDriverException
 import logging
 from contextlib import asynccontextmanager
+from app import metrics
+from app.http_scraper import HttpBookFetcher, MONTHS, record_missing_fields
+
+
+# Single sentinel waited on before extraction; every other field is read without waiting
+PAGE_READY_SELECTOR = '.product-title'
+PAGE_READY_SCRIPT = f"""
+return document.readyState !== 'loading' && document.querySelector('{PAGE_READY_SELECTOR}') !== null;
+"""
+
+# Requests blocked in lean mode. Stylesheets are kept because innerText depends on layout.
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*hotjar.com*", "*clarity.ms*", "*hs-scripts.com*", "*hs-analytics.net*", "*bing.com/bat*",
+]
+
+LEAN_CHROME_ARGUMENTS = [
+    "--window-size=800,600",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-notifications",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+# Network is considered idle once no request has been in flight for this long
+NETWORK_IDLE_SECONDS = 0.5
+# Once the DOM is ready, how long to wait for the network to go idle before extracting anyway
+NETWORK_IDLE_GRACE_SECONDS = 1.5
+READY_POLL_SECONDS = 0.1
+
+# Collects every book field in one execute_script call. Missing sections come back as null or [].
+EXTRACT_BOOK_SCRIPT = """
+const text = (el) => el ? el.innerText.trim() : null;
+const xpathAll = (expr, context) => {
+    const result = document.evaluate(expr, context || document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+    return nodes;
+};
+const xpathFirst = (expr, context) => xpathAll(expr, context)[0] || null;
+const texts = (nodes) => nodes.map((node) => node.innerText.trim());
+
+const price = document.querySelector('.product-details-price');
+const meta = document.querySelector('.product-meta.product-details-information');
+return {
+    title: text(document.querySelector('.product-title')),
+    authors: texts(xpathAll("//div[contains(@class, 'authors')]/span[not(@class)]")),
+    hasPrice: price !== null,
+    originalPrice: price ? text(price.querySelector('del')) : null,
+    discountedPrice: price ? text(xpathFirst(".//span[contains(@class, 'fw-600')]", price)) : null,
+    rating: text(document.querySelector('.star-rating-total-rating-medium')),
+    numRatings: text(document.querySelector('.star-rating-total-count')),
+    meta: meta ? texts(Array.from(meta.querySelectorAll('span'))) : [],
+    keyBenefits: texts(xpathAll("//h2[contains(text(), 'Key benefits')]/following-sibling::ul[1]/li")),
+    description: text(xpathFirst("//h2[contains(text(), 'Description')]/following-sibling::div[1]")),
+    whatYouWillLearn: texts(xpathAll("//h2[contains(text(), 'What you will learn')]/following-sibling::ul[1]/li")),
+};
+"""
+
+
+@lru_cache(maxsize=1)
+def get_chromedriver_path():
+    """Resolve the chromedriver binary once per process."""
+    return ChromeDriverManager().install()
+
+
+class DriverPool:
+    """
+    A fixed-size pool of warm Chrome drivers.
+
+    Drivers are created lazily up to `size`, reset between pages and recycled
+    after `max_pages_per_driver` pages or after a crash.
+    """
+
+    def __init__(self, create_driver, size=2, max_pages_per_driver=50):
+        self.create_driver = create_driver
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self.logger = logging.getLogger(__name__)
+        self._idle = []
+        # Every live driver, idle or checked out, so close() can quit them all
+        self._drivers = set()
+        self._pages_served = {}
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Condition()
+
+    def acquire(self):
+        """Check out a driver, creating one if the pool is not yet full."""
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                self._lock.wait()
+
+        try:
+            driver = self.create_driver()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._drivers.add(driver)
+            self._pages_served[id(driver)] = 0
+            closed = self._closed
+        if closed:
+            # close() ran while this driver was starting
+            self._quit(driver)
+            raise RuntimeError("Driver pool is closed")
+        return driver
+
+    def release(self, driver, broken=False):
+        """Return a driver to the pool, or retire it if it crashed or is worn out."""
+        pages = self._pages_served.get(id(driver), 0) + 1
+        self._pages_served[id(driver)] = pages
+
+        if not broken and pages < self.max_pages_per_driver and not self._closed:
+            try:
+                self._reset(driver)
+            except WebDriverException as e:
+                self.logger.warning(f"Failed to reset driver, recycling it: {str(e)}")
+                broken = True
+        else:
+            broken = True
+
+        if broken:
+            self._quit(driver)
+
+        with self._lock:
+            if not broken:
+                self._idle.append(driver)
+            self._lock.notify()
+
+    def close(self):
+        """
+        Quit every driver, including those still checked out by cancelled or running scrapes,
+        and refuse further checkouts. Their later release() is a no-op.
+        """
+        with self._lock:
+            self._closed = True
+            drivers = list(self._drivers)
+            self._idle = []
+            self._lock.notify_all()
+        for driver in drivers:
+            self._quit(driver)
+
+    def _reset(self, driver):
+        driver.delete_all_cookies()
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+
+    def _quit(self, driver):
+        with self._lock:
+            if driver not in self._drivers:
+                return
+            self._drivers.discard(driver)
+            self._created -= 1
+        self._pages_served.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException as e:
+            self.logger.warning(f"Failed to quit driver: {str(e)}")
+
+
+class HostRateLimiter:
+    """Spaces out requests so that no host sees more than `requests_per_second`."""
+
+    def __init__(self, requests_per_second=1.0):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class LatencyTracker:
+    """Keeps recent page-load latencies per host and derives a timeout from their p95."""
+
+    def __init__(self, default_timeout=30, min_timeout=5, max_timeout=60, window=100):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, url, seconds):
+        with self._lock:
+            self._samples[urlparse(url).netloc].append(seconds)
+
+    def p95(self, url):
+        with self._lock:
+            samples = sorted(self._samples[urlparse(url).netloc])
+        if len(samples) < 5:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def timeout_for(self, url):
+        p95 = self.p95(url)
+        if p95 is None:
+            return self.default_timeout
+        return min(self.max_timeout, max(self.min_timeout, p95 * 3))
+
 
 class BookScraper:
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, max_concurrency=2, requests_per_second=1.0, max_pages_per_driver=50,
+                 use_http=True, lean=True, blocked_url_patterns=None, cache=None):
         self.headless = headless
+        self.cache = cache
+        self.lean = lean
+        self.blocked_url_patterns = DEFAULT_BLOCKED_URL_PATTERNS if blocked_url_patterns is None else blocked_url_patterns
+        self.bytes_transferred = 0
+        self._bytes_lock = threading.Lock()
+        self.max_concurrency = max_concurrency
         self.logger = logging.getLogger(__name__)
+        self.pool = DriverPool(self._create_driver, size=max_concurrency, max_pages_per_driver=max_pages_per_driver)
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.latency = LatencyTracker()
+        # Blocking WebDriver calls run here so the event loop can drive several pages at once
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="scraper")
+        # Browserless fast path; Chrome is only launched for pages it cannot handle
+        self.http_fetcher = HttpBookFetcher(pool_size=max_concurrency, cache=cache) if use_http else None
 
-    @asynccontextmanager
-    async def get_driver(self):
+    def _create_driver(self):
         options = Options()
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
         options.add_argument("--disable-blink-features=AutomationControlled")
+        # Return from driver.get at DOMContentLoaded; readiness is checked by _wait_for_page_ready
+        options.page_load_strategy = 'eager'
+        # Performance logs expose CDP Network events, used to detect network idle
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
         if self.headless:
             options.add_argument("--headless")
+        if self.lean:
+            for argument in LEAN_CHROME_ARGUMENTS:
+                options.add_argument(argument)
+            options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.managed_default_content_settings.fonts": 2,
+                "profile.default_content_setting_values.notifications": 2,
+            })
 
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
+        service = Service(get_chromedriver_path())
+        with metrics.timer("driver_launch"):
+            driver = webdriver.Chrome(service=service, options=options)
 
         driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
             "source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
         })
+        if self.lean and self.blocked_url_patterns:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_url_patterns})
+        return driver
 
+    async def _run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    @asynccontextmanager
+    async def get_driver(self):
+        with metrics.timer("driver_acquire"):
+            driver = await self._run_blocking(self.pool.acquire)
+        broken = False
         try:
             yield driver
+        except WebDriverException:
+            broken = True
+            raise
         finally:
-            driver.quit()
+            try:
+                await self._run_blocking(self.pool.release, driver, broken)
+            except RuntimeError:
+                # The executor is gone because close() ran; the pool already quit this driver
+                self.pool.release(driver, broken)
+
+    def close(self):
+        """Shut down all pooled drivers, HTTP connections and the worker threads."""
+        self.pool.close()
+        if self.http_fetcher:
+            self.http_fetcher.close()
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
 
     async def scrape_book_details(self, book_url, max_retries=3):
+        if self.http_fetcher:
+            # Fresh cache hits go straight to extraction, without network or browser
+            book_details = await self._run_blocking(self.http_fetcher.scrape_cached_book_details, book_url)
+            if book_details:
+                metrics.inc("pages_scraped_total", source="cache")
+                return book_details
+
+            await self.rate_limiter.wait(book_url)
+            book_details = await self._run_blocking(self.http_fetcher.scrape_book_details, book_url)
+            if book_details:
+                metrics.inc("pages_scraped_total", source="http")
+                return book_details
+            self.logger.info(f"Falling back to Selenium for {book_url}")
+        return await self._scrape_with_browser(book_url, max_retries)
+
+    async def _scrape_with_browser(self, book_url, max_retries=3, backoff_base=1.0, backoff_cap=30.0):
         for attempt in range(max_retries):
             try:
+                await self.rate_limiter.wait(book_url)
                 async with self.get_driver() as driver:
-                    driver.set_page_load_timeout(30)
-                    await asyncio.sleep(2)
-                    driver.get(book_url)
-                    await asyncio.sleep(5)
-                    book_details = await self._extract_book_details(driver)
+                    await self._run_blocking(self._load_page, driver, book_url)
+                    book_details = await self._run_blocking(self._extract_book_details, driver)
+                    if self.cache:
+                        # Keep the rendered page so later runs can extract it without Chrome
+                        page_source = await self._run_blocking(lambda: driver.page_source)
+                        await self._run_blocking(self.cache.put, book_url, page_source)
                     book_details['url'] = book_url  # Add URL to book details
+                    metrics.inc("pages_scraped_total", source="browser")
                     return book_details
             except WebDriverException as e:
                 self.logger.warning(f"Attempt {attempt + 1} failed for {book_url}: {str(e)}")
                 if attempt == max_retries - 1:
                     self.logger.error(f"Failed to scrape {book_url} after {max_retries} attempts")
+                    metrics.inc("scrape_failures_total")
                     return None
-                await asyncio.sleep(2)
+                metrics.inc("scrape_retries_total")
+                # Exponential backoff with full jitter
+                await asyncio.sleep(random.uniform(0, min(backoff_cap, backoff_base * 2 ** attempt)))
+
+    def _load_page(self, driver, book_url):
+        timeout = self.latency.timeout_for(book_url)
+        driver.set_page_load_timeout(timeout)
+        driver.get_log("performance")  # Drop network events left over from the previous page
+
+        start = time.monotonic()
+        driver.get(book_url)
+        ready_at, idle, transferred = self._wait_for_page_ready(driver, start + timeout)
+        elapsed = time.monotonic() - start
+        metrics.REGISTRY.observe("stage_duration_seconds", elapsed, stage="page_load")
+        if ready_at is None:
+            metrics.inc("page_load_timeouts_total", reason="dom")
+            self.logger.warning(f"Page not ready after {timeout:.1f}s: {book_url}")
+        else:
+            # Only pages that became ready feed the adaptive timeout, timed to readiness rather than idle
+            self.latency.record(book_url, ready_at - start)
+            if not idle:
+                metrics.inc("page_load_timeouts_total", reason="network_idle")
+                self.logger.info(f"Network still busy {NETWORK_IDLE_GRACE_SECONDS}s after DOM ready: {book_url}")
+        # Pages load on several executor threads at once
+        with self._bytes_lock:
+            self.bytes_transferred += transferred
+        metrics.inc("browser_bytes_total", transferred)
+        self.logger.info(f"Loaded {book_url} in {elapsed:.2f}s, {transferred / 1024:.1f} KiB transferred")
+
+    def _wait_for_page_ready(self, driver, deadline):
+        """
+        Polls until the document is parsed and the product container exists, then gives the
+        network up to NETWORK_IDLE_GRACE_SECONDS to go idle for NETWORK_IDLE_SECONDS, so pages
+        that never go quiet (beacons, long-polls) cost at most the grace period.
+
+        Returns when the DOM became ready (None if it did not before `deadline`), whether the
+        network went idle, and the number of bytes received over the network.
+        """
+        transferred = 0
+        in_flight = set()
+        idle_since = None
+        ready_at = None
+        while True:
+            for entry in driver.get_log("performance"):
+                message = json.loads(entry["message"])["message"]
+                method = message.get("method")
+                request_id = message.get("params", {}).get("requestId")
+                if method == "Network.requestWillBeSent":
+                    in_flight.add(request_id)
+                elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                    in_flight.discard(request_id)
+                    transferred += message["params"].get("encodedDataLength", 0)
+
+            now = time.monotonic()
+            if ready_at is None and driver.execute_script(PAGE_READY_SCRIPT):
+                ready_at = now
+            if ready_at is not None and not in_flight:
+                idle_since = idle_since or now
+                if now - idle_since >= NETWORK_IDLE_SECONDS:
+                    return ready_at, True, transferred
+            else:
+                idle_since = None
+
+            if ready_at is not None and now - ready_at >= NETWORK_IDLE_GRACE_SECONDS:
+                return ready_at, False, transferred
+            if ready_at is None and now >= deadline:
+                return None, False, transferred
+            time.sleep(READY_POLL_SECONDS)
+
+    def _extract_book_details(self, driver):
+        with metrics.timer("extract_script"):
+            raw = driver.execute_script(EXTRACT_BOOK_SCRIPT) or {}
 
-    async def _extract_book_details(self, driver):
         book_details = {}
 
         # Extract Title
-        book_details['title'] = self._safe_get_text(driver, (By.CLASS_NAME, 'product-title')) or "Title not found"
+        book_details['title'] = raw.get('title') or "Title not found"
 
         # Extract Author
-        authors = self._safe_get_elements(driver, (By.XPATH, "//div[contains(@class, 'authors')]/span[not(@class)]"))
-        if authors:
-            author_names = [author.text.strip() for author in authors]
-            book_details['author'] = ", ".join(filter(None, author_names))
-        else:
-            book_details['author'] = "Author not found"
+        author_names = [author.strip() for author in raw.get('authors') or []]
+        book_details['author'] = ", ".join(filter(None, author_names)) or "Author not found"
 
         # Extract Prices
-        price_element = self._safe_get_element(driver, (By.CLASS_NAME, 'product-details-price'))
-        if price_element:
-            book_details['original_price'] = self._safe_get_text(price_element,
-                                                                 (By.TAG_NAME, 'del')) or "Original price not found"
-            book_details['discounted_price'] = self._safe_get_text(price_element, (
-            By.XPATH, ".//span[contains(@class, 'fw-600')]")) or "Discounted price not found"
+        if raw.get('hasPrice'):
+            book_details['original_price'] = raw.get('originalPrice') or "Original price not found"
+            book_details['discounted_price'] = raw.get('discountedPrice') or "Discounted price not found"
         else:
             book_details['original_price'] = book_details['discounted_price'] = "Price not found"
 
         # Extract Rating
-        rating_element = self._safe_get_element(driver, (By.CLASS_NAME, 'star-rating-total-rating-medium'))
-        book_details['rating'] = rating_element.text if rating_element else "Rating not found"
+        book_details['rating'] = raw.get('rating') or "Rating not found"
 
         # Extract Number of Ratings
-        num_ratings_element = self._safe_get_element(driver, (By.CLASS_NAME, 'star-rating-total-count'))
-        if num_ratings_element:
-            num_ratings_text = num_ratings_element.text.strip('()')
-            book_details['num_ratings'] = num_ratings_text if num_ratings_text else "0"
-        else:
-            book_details['num_ratings'] = "0"
+        num_ratings_text = (raw.get('numRatings') or '').strip('()')
+        book_details['num_ratings'] = num_ratings_text if num_ratings_text else "0"
 
         # Extract additional details
-        meta_info = self._safe_get_element(driver, (By.CLASS_NAME, 'product-meta.product-details-information'))
-        if meta_info:
-            meta_items = meta_info.find_elements(By.TAG_NAME, 'span')
-            for item in meta_items:
-                text = item.text.strip()
-                if 'pages' in text.lower():
-                    book_details['pages'] = text.split()[0]
-                elif 'edition' in text.lower():
-                    book_details['edition'] = text
-                elif any(month in text for month in
-                         ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']):
-                    book_details['publication_date'] = text
+        for text in raw.get('meta') or []:
+            if 'pages' in text.lower():
+                book_details['pages'] = text.split()[0]
+            elif 'edition' in text.lower():
+                book_details['edition'] = text
+            elif any(month in text for month in MONTHS):
+                book_details['publication_date'] = text
 
         # Set default values if not found
         book_details.setdefault('pages', "Pages not specified")
@@ -112,41 +475,42 @@ class BookScraper:
         book_details.setdefault('publication_date', "Publication date not found")
 
         # Extract Key Benefits
-        key_benefits = self._safe_get_elements(driver, (
-        By.XPATH, "//h2[contains(text(), 'Key benefits')]/following-sibling::ul[1]/li"))
-        book_details['key_benefits'] = [benefit.text for benefit in key_benefits] if key_benefits else [
-            "No key benefits found"]
+        book_details['key_benefits'] = raw.get('keyBenefits') or ["No key benefits found"]
 
         # Extract Description
-        book_details['description'] = self._safe_get_text(driver, (
-        By.XPATH, "//h2[contains(text(), 'Description')]/following-sibling::div[1]")) or "Description not found"
+        book_details['description'] = raw.get('description') or "Description not found"
 
         # Extract What You Will Learn
-        what_you_will_learn = self._safe_get_elements(driver, (
-        By.XPATH, "//h2[contains(text(), 'What you will learn')]/following-sibling::ul[1]/li"))
-        book_details['what_you_will_learn'] = [item.text for item in what_you_will_learn] if what_you_will_learn else [
-            "No information found"]
+        book_details['what_you_will_learn'] = raw.get('whatYouWillLearn') or ["No information found"]
 
+        record_missing_fields(book_details, "browser")
         return book_details
 
-    def _safe_get_element(self, driver, locator, timeout=10):
-        try:
-            return WebDriverWait(driver, timeout).until(EC.presence_of_element_located(locator))
-        except TimeoutException:
-            self.logger.warning(f"Element not found: {locator}")
-            return None
-
-    def _safe_get_elements(self, driver, locator, timeout=10):
-        try:
-            return WebDriverWait(driver, timeout).until(EC.presence_of_all_elements_located(locator))
-        except TimeoutException:
-            self.logger.warning(f"Elements not found: {locator}")
-            return []
-
-    def _safe_get_text(self, driver, locator, timeout=10):
-        element = self._safe_get_element(driver, locator, timeout)
-        return element.text.strip() if element else "Not found"
+    async def _bounded_scrape(self, semaphore, url):
+        async with semaphore:
+            with metrics.REGISTRY.in_flight("pages_in_flight"):
+                return url, await self.scrape_book_details(url)
 
     async def scrape_multiple_books(self, book_urls):
-        tasks = [self.scrape_book_details(url) for url in book_urls]
-        return await asyncio.gather(*tasks)
\ No newline at end of file
+        """
+        Scrapes the given URLs with at most `max_concurrency` pages in flight.
+        Results are returned in input order; failed URLs yield None.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self._bounded_scrape(semaphore, url) for url in book_urls))
+        return [details for _, details in results]
+
+    async def iter_books(self, book_urls):
+        """
+        Yields (url, details) as each page finishes, with at most `max_concurrency` pages in
+        flight; details is None for failed URLs. Pages still running are cancelled if the
+        caller stops iterating early.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.ensure_future(self._bounded_scrape(semaphore, url)) for url in book_urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -1,73 +1,177 @@
 # search.py
+import logging
+import os
+import tempfile
+import time
+import psycopg2
 import streamlit as st
 import pandas as pd
-import base64
-import os
-from psycopg2.extras import RealDictCursor
+from app.db import ensure_search_schema
+
+
+PAGE_SIZE = 50
+
+# Past this, a page is served from the catalog snapshot instead
+SEARCH_TIMEOUT_MS = int(os.getenv('SEARCH_TIMEOUT_MS', 3000))
+
+SEARCH_COLUMNS = "title, author, original_price, discounted_price, rating, num_ratings, publication_date, pages, edition, url"
+
+# Ranked full-text match, widened with trigram word similarity for partial or misspelled terms.
+# Keyset pagination on (rank, url) keeps every page an index-backed query.
+SEARCH_QUERY = f"""
+SELECT {SEARCH_COLUMNS}, rank FROM (
+    SELECT {SEARCH_COLUMNS},
+           -- float8 so the cursor value round-trips through Python exactly
+           (ts_rank(search_vector, query) + word_similarity(%(term)s, title))::float8 AS rank
+    FROM books, websearch_to_tsquery('english', %(term)s) AS query
+    WHERE search_vector @@ query OR %(term)s <%% title OR %(term)s <%% author
+) ranked
+WHERE %(last_rank)s::float8 IS NULL OR (rank, url) < (%(last_rank)s::float8, %(last_url)s)
+ORDER BY rank DESC, url DESC
+LIMIT %(limit)s
+"""
+
+# The full matching set, unpaginated, for exports
+EXPORT_SEARCH_QUERY = f"""
+SELECT {SEARCH_COLUMNS} FROM books, websearch_to_tsquery('english', %(term)s) AS query
+WHERE search_vector @@ query OR %(term)s <%% title OR %(term)s <%% author
+ORDER BY ts_rank(search_vector, query) + word_similarity(%(term)s, title) DESC, url DESC
+"""
+
+SNAPSHOT_COLUMNS = [column.strip() for column in SEARCH_COLUMNS.split(",")]
+
+EXPORT_ALL_QUERY = f"SELECT {SEARCH_COLUMNS} FROM books ORDER BY title, url"
+
+# label -> (format, gzip, file extension, mime type)
+EXPORT_OPTIONS = {
+    "CSV": ("csv", False, "csv", "text/csv"),
+    "JSON Lines": ("jsonl", False, "jsonl", "application/x-ndjson"),
+    "CSV (gzip)": ("csv", True, "csv.gz", "application/gzip"),
+    "JSON Lines (gzip)": ("jsonl", True, "jsonl.gz", "application/gzip"),
+}
+
+BROWSE_QUERY = f"""
+SELECT {SEARCH_COLUMNS} FROM books
+WHERE %(last_title)s::text IS NULL OR (title, url) > (%(last_title)s, %(last_url)s)
+ORDER BY title, url
+LIMIT %(limit)s
+"""
+
+
+@st.cache_resource
+def _prepare_search_schema(_db):
+    with _db.connection() as conn:
+        ensure_search_schema(conn)
+    return True
 
 
-def search_books_page(db_conn):
-    search_term = st.text_input("Enter book title, author, or keyword:")
+def _fetch_page(query_cache, search_term, cursor):
+    """Fetches one page of results after the given keyset cursor (None for the first page)."""
+    cursor = cursor or {}
+    if search_term:
+        rows = query_cache.fetch(SEARCH_QUERY, {'term': search_term, 'last_rank': cursor.get('rank'),
+                                                'last_url': cursor.get('url'), 'limit': PAGE_SIZE + 1},
+                                timeout_ms=SEARCH_TIMEOUT_MS)
+    else:
+        rows = query_cache.fetch(BROWSE_QUERY, {'last_title': cursor.get('title'), 'last_url': cursor.get('url'),
+                                                'limit': PAGE_SIZE + 1},
+                                timeout_ms=SEARCH_TIMEOUT_MS)
+    # One extra row tells us whether a next page exists
+    return rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+
+
+def _fetch_snapshot_page(snapshot, search_term, page, error):
+    """Serves the page from the catalog snapshot when the database is down or too slow."""
+    refreshed = time.strftime("%Y-%m-%d %H:%M", snapshot.refreshed_at)
+    st.warning(f"The database is unavailable, showing the catalog snapshot from {refreshed}. "
+               "Results match titles and authors only.")
+    logging.warning(f"Search served from the catalog snapshot: {error}")
+    return snapshot.search(search_term, page * PAGE_SIZE, PAGE_SIZE, SNAPSHOT_COLUMNS)
+
 
-    if db_conn:
+def search_books_page(db, query_cache, snapshot=None):
+    search_term = st.text_input("Enter book title, author, or keyword:").strip()
+
+    # Stack of keyset cursors, one per page already visited, reset whenever the term changes
+    if st.session_state.get('search_term') != search_term:
+        st.session_state['search_term'] = search_term
+        st.session_state['search_cursors'] = [None]
+    cursors = st.session_state['search_cursors']
+
+    matches = None
+    error = "Database connection is not available. Please check your database connection."
+    if db and query_cache:
         try:
-            with db_conn.cursor(cursor_factory=RealDictCursor) as cur:
-                if search_term:
-                    query = """
-                    SELECT title, author, original_price, discounted_price, rating, num_ratings, publication_date, pages, edition
-                    FROM books
-                    WHERE title ILIKE %s OR author ILIKE %s OR description ILIKE %s
-                    """
-                    cur.execute(query, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-                else:
-                    query = """
-                    SELECT title, author, original_price, discounted_price, rating, num_ratings, publication_date, pages, edition
-                    FROM books
-                    """
-                    cur.execute(query)
-
-                matches = cur.fetchall()
-
-            if matches:
-                st.write(f"Found {len(matches)} matching books:")
-                df = pd.DataFrame(matches)
-
-                # Display using Streamlit's built-in table
-                st.dataframe(
-                    df,
-                    column_config={
-                        "title": st.column_config.TextColumn("Title", width="medium"),
-                        "author": st.column_config.TextColumn("Author", width="medium"),
-                        "original_price": st.column_config.TextColumn("Original Price", width="small"),
-                        "discounted_price": st.column_config.TextColumn("Discounted Price", width="small"),
-                        "rating": st.column_config.NumberColumn("Rating", format="%.1f", width="small"),
-                        "num_ratings": st.column_config.NumberColumn("Number of Ratings", width="small"),
-                        "publication_date": st.column_config.DateColumn("Publication Date", width="medium"),
-                        "pages": st.column_config.NumberColumn("Pages", width="small"),
-                        "edition": st.column_config.TextColumn("Edition", width="small"),
-                    },
-                    hide_index=True,
-                    use_container_width=True
-                )
-
-                # Export options
-                st.subheader("Export Results")
-                export_format = st.selectbox("Select Export Format", ["CSV", "JSON"], key="export_format")
-
-                if st.button("Export"):
-                    if export_format == "CSV":
-                        csv = df.to_csv(index=False)
-                        b64 = base64.b64encode(csv.encode()).decode()
-                        href = f'<a href="data:file/csv;base64,{b64}" download="search_results.csv">Download CSV File</a>'
-                        st.markdown(href, unsafe_allow_html=True)
-                    elif export_format == "JSON":
-                        json = df.to_json(orient='records')
-                        b64 = base64.b64encode(json.encode()).decode()
-                        href = f'<a href="data:file/json;base64,{b64}" download="search_results.json">Download JSON File</a>'
-                        st.markdown(href, unsafe_allow_html=True)
-            else:
-                st.info("No matches found.")
+            _prepare_search_schema(db)
+            matches, has_next = _fetch_page(query_cache, search_term, cursors[-1])
+        except psycopg2.Error as e:
+            error = f"Error querying the database: {str(e)}"
         except Exception as e:
             st.error(f"Error querying the database: {str(e)}")
-    else:
-        st.error("Database connection is not available. Please check your database connection.")
\ No newline at end of file
+            return
+
+    from_snapshot = matches is None
+    if from_snapshot:
+        if snapshot is None or snapshot.table() is None:
+            st.error(error)
+            return
+        matches, has_next = _fetch_snapshot_page(snapshot, search_term, len(cursors) - 1, error)
+
+    try:
+        if matches:
+            first = (len(cursors) - 1) * PAGE_SIZE + 1
+            st.write(f"Showing matching books {first}-{first + len(matches) - 1}:")
+            df = pd.DataFrame(matches).drop(columns=['rank', 'url'], errors='ignore')
+
+            previous_col, next_col = st.columns(2)
+            with previous_col:
+                if st.button("Previous page", disabled=len(cursors) == 1):
+                    cursors.pop()
+                    st.rerun()
+            with next_col:
+                if st.button("Next page", disabled=not has_next):
+                    last = matches[-1]
+                    cursors.append({'rank': last.get('rank'), 'title': last['title'], 'url': last['url']})
+                    st.rerun()
+
+            # Display using Streamlit's built-in table
+            st.dataframe(
+                df,
+                column_config={
+                    "title": st.column_config.TextColumn("Title", width="medium"),
+                    "author": st.column_config.TextColumn("Author", width="medium"),
+                    "original_price": st.column_config.TextColumn("Original Price", width="small"),
+                    "discounted_price": st.column_config.TextColumn("Discounted Price", width="small"),
+                    "rating": st.column_config.NumberColumn("Rating", format="%.1f", width="small"),
+                    "num_ratings": st.column_config.NumberColumn("Number of Ratings", width="small"),
+                    "publication_date": st.column_config.DateColumn("Publication Date", width="medium"),
+                    "pages": st.column_config.NumberColumn("Pages", width="small"),
+                    "edition": st.column_config.TextColumn("Edition", width="small"),
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+
+            # Exports stream from the database, so they wait until it is back
+            if from_snapshot:
+                return
+
+            # Export options
+            st.subheader("Export Results")
+            export_option = st.selectbox("Select Export Format", list(EXPORT_OPTIONS), key="export_format")
+
+            if st.button("Export"):
+                from app.export import stream_query_export  # pyarrow is only needed once an export runs
+                export_format, compress, extension, mime = EXPORT_OPTIONS[export_option]
+                query = EXPORT_SEARCH_QUERY if search_term else EXPORT_ALL_QUERY
+                # Rows stream from the database into a temporary file; no DataFrame or base64 copy is built
+                with tempfile.TemporaryFile() as f:
+                    exported = stream_query_export(db, query, {'term': search_term}, f,
+                                                   export_format=export_format, compress=compress)
+                    f.seek(0)
+                    st.download_button(f"Download {exported} books", data=f.read(),
+                                       file_name=f"search_results.{extension}", mime=mime)
+        else:
+            st.info("No matches found.")
+    except Exception as e:
+        st.error(f"Error querying the database: {str(e)}")
@@ -0,0 +1,174 @@
+# snapshot.py
+"""
+Columnar snapshot of the books table in Arrow IPC format.
+
+The snapshot is written sorted by (title, url) and uncompressed, so every app process can
+memory-map it and all sessions share the same pages of the file without copying rows into
+Python objects. It backs read-only pages when Postgres is down or slow.
+
+Refresh with: python -m app.snapshot [--full]
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+from dotenv import load_dotenv
+from app.db import ConnectionManager, prepare_updated_at
+from app.export import PARQUET_SCHEMA, arrow_table, stream_books
+
+SNAPSHOT_PATH = "data/catalog.arrow"
+SORT_KEYS = [("title", "ascending"), ("url", "ascending")]
+WATERMARK_KEY = b"watermark"
+
+
+def _read(path):
+    """Memory-maps the snapshot; the returned table references the mapped file, not a copy."""
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _fresh_rows(existing, changed):
+    """Drops re-read rows that the snapshot already holds at the same updated_at."""
+    known = existing.select(["url", "updated_at"]).rename_columns(["url", "known_updated_at"])
+    joined = changed.join(known, "url", join_type="left outer")
+    fresh = pc.fill_null(pc.not_equal(joined["updated_at"], joined["known_updated_at"]), True)
+    return joined.filter(fresh).select(PARQUET_SCHEMA.names).cast(PARQUET_SCHEMA)
+
+
+def refresh_snapshot(db, path=SNAPSHOT_PATH, full=False, chunk_size=5000):
+    """
+    Brings the snapshot up to date with the books table and returns the number of rows changed.
+
+    Only rows updated since the snapshot's watermark (less the export margin for late commits)
+    are read from Postgres and merged in by URL. A full rebuild happens when there is no
+    snapshot yet, when `full` is set, or when the row counts disagree afterwards (books were deleted).
+    """
+    existing = None
+    watermark = None
+    if not full and os.path.exists(path):
+        existing = _read(path)
+        metadata = existing.schema.metadata or {}
+        watermark = metadata.get(WATERMARK_KEY, b"").decode() or None
+
+    with db.connection() as conn:
+        prepare_updated_at(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*), max(updated_at) FROM books")
+            total, latest = cur.fetchone()
+        changed = [arrow_table(rows) for rows in stream_books(conn, chunk_size, since=watermark)]
+        conn.rollback()
+
+    changed = pa.concat_tables(changed) if changed else PARQUET_SCHEMA.empty_table()
+    if existing is not None and watermark:
+        changed = _fresh_rows(existing, changed)
+        kept = existing.filter(pc.invert(pc.is_in(existing["url"], value_set=changed["url"].combine_chunks())))
+        table = pa.concat_tables([kept.cast(PARQUET_SCHEMA), changed])
+        if table.num_rows != total:
+            logging.info("Snapshot row count differs from books, rebuilding it")
+            return refresh_snapshot(db, path, full=True, chunk_size=chunk_size)
+        if not changed.num_rows:
+            return 0
+    else:
+        table = changed
+
+    table = table.sort_by(SORT_KEYS).replace_schema_metadata(
+        {WATERMARK_KEY: latest.isoformat() if latest else ""})
+    _write(table, path)
+    logging.info(f"Catalog snapshot refreshed: {table.num_rows} books, {changed.num_rows} changed")
+    return changed.num_rows
+
+
+def _write(table, path):
+    """Writes to a temporary file and renames it into place, so readers never map a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=64 * 1024)
+    os.replace(tmp_path, path)
+
+
+class CatalogSnapshot:
+    """
+    Read-only view of the memory-mapped snapshot, shared by every session of the process.
+    The file is re-mapped when a refresh replaces it.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._table = None
+        self._mtime = None
+        self._derived = {}
+
+    def table(self):
+        """Returns the mapped table, or None if no snapshot has been written yet."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                self._table = _read(self.path)
+                self._mtime = mtime
+                self._derived = {}
+            return self._table
+
+    @property
+    def refreshed_at(self):
+        try:
+            return time.localtime(os.stat(self.path).st_mtime)
+        except FileNotFoundError:
+            return None
+
+    def cached(self, name, compute):
+        """Returns compute(table), computed once per snapshot version; for aggregates shared by sessions."""
+        table = self.table()
+        if table is None:
+            return None
+        with self._lock:
+            if name in self._derived and self._table is table:
+                return self._derived[name]
+        value = compute(table)
+        with self._lock:
+            if self._table is table:
+                self._derived[name] = value
+        return value
+
+    def search(self, term, offset, limit, columns):
+        """
+        Returns up to `limit` rows (as dicts) from `offset` whose title or author contains `term`
+        (all rows if `term` is empty), in (title, url) order, plus whether more rows follow.
+        Only the requested slice is converted to Python objects.
+        """
+        table = self.table()
+        if table is None:
+            return [], False
+        if term:
+            mask = pc.or_(pc.match_substring(table["title"], term, ignore_case=True),
+                          pc.match_substring(table["author"], term, ignore_case=True))
+            table = table.filter(pc.fill_null(mask, False))
+        rows = table.slice(offset, limit + 1).select(columns).to_pylist()
+        return rows[:limit], len(rows) > limit
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the memory-mapped catalog snapshot.")
+    parser.add_argument("--path", default=SNAPSHOT_PATH)
+    parser.add_argument("--full", action="store_true", help="Rebuild instead of merging changed rows")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    db = ConnectionManager.from_env()
+    try:
+        print(f"Wrote {refresh_snapshot(db, args.path, full=args.full)} changed books to {args.path}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
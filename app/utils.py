@@ -1,6 +1,20 @@
 import logging
+import math
 import re
 import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+import pandas as pd
+
+CURRENCY_SYMBOLS = {'$': 'USD', '£': 'GBP', '€': 'EUR', '₹': 'INR'}
+CURRENCY_PREFIXES = {code: symbol for symbol, code in CURRENCY_SYMBOLS.items()}
+
+# Compiled once at import instead of on every call
+WHITESPACE_PATTERN = re.compile(r'\s+')
+NON_PRICE_PATTERN = re.compile(r'[^\d\.]')
+NON_DIGIT_PATTERN = re.compile(r'\D')
+PACKT_URL_PATTERN = re.compile(r'^https?:\/\/www\.packtpub\.com\/[a-zA-Z0-9\-_\/]+$')
+CURRENCY_CODE_PATTERN = re.compile(r'\b(USD|GBP|EUR|INR)\b')
 
 def clean_text(text, lower=False):
     """
@@ -10,42 +24,88 @@ def clean_text(text, lower=False):
     if not text:
         return text
     text = text.strip()  # Trim leading/trailing whitespace
-    text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces/newlines with a single space
+    text = WHITESPACE_PATTERN.sub(' ', text)  # Replace multiple spaces/newlines with a single space
     if lower:
         text = text.lower()
     return text
 
 def normalize_price(price):
     """
-    Normalizes the price format by ensuring it is in a consistent format (e.g., "$39.99").
+    Normalizes the price format by ensuring it is in a consistent format (e.g., "$39.99", "€39.99").
+    The currency symbol is kept as detected; a price without one is returned as the bare amount.
     """
     if not price:
         return "N/A"
 
-    # Remove any non-numeric or non-dollar characters, keeping only the price
-    price = re.sub(r'[^\d\.]', '', price)
+    currency = detect_currency(price)
+    # Remove any non-numeric characters, keeping only the amount
+    amount = NON_PRICE_PATTERN.sub('', price)
 
     try:
-        float(price)  # This will raise a ValueError if price is not a valid number
+        float(amount)  # This will raise a ValueError if price is not a valid number
     except ValueError:
         return "N/A"
 
-    return f"${price}"
+    return f"{CURRENCY_PREFIXES.get(currency, '')}{amount}"
+
+
+def detect_currency(price):
+    """Returns the ISO code of the currency symbol or code in a price string, or None."""
+    currency = next((code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in price), None)
+    if currency is None:
+        match = CURRENCY_CODE_PATTERN.search(price)
+        currency = match.group(1) if match else None
+    return currency
+
+
+def parse_price(price):
+    """
+    Parses a price such as "$39.99" into integer cents and an ISO currency code.
+    Returns (None, None) when no price can be read.
+    """
+    if not price:
+        return None, None
+
+    amount = NON_PRICE_PATTERN.sub('', price)
+    try:
+        cents = int((Decimal(amount) * 100).to_integral_value())
+    except InvalidOperation:
+        return None, None
+
+    return cents, detect_currency(price)
+
+
+def parse_publication_date(text):
+    """
+    Parses a publication date such as "Mar 2024" into the first day of that month.
+    Returns None when the text is not a recognizable date.
+    """
+    if isinstance(text, date):
+        return text
+    if not text:
+        return None
+    for fmt in ('%b %Y', '%B %Y', '%d %b %Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
 
 def validate_url(url):
     """
     Validates the given URL to ensure it's a well-formed Packt Publishing URL.
     """
-    packt_url_pattern = r'^https?:\/\/www\.packtpub\.com\/[a-zA-Z0-9\-_\/]+$'
-    return bool(re.match(packt_url_pattern, url))
+    return bool(PACKT_URL_PATTERN.match(url))
 
-def validate_book_data(book_data):
+def validate_book_data(book_data, normalize_prices=True):
     """
     Validates the book data to ensure that all required fields are present and correctly formatted.
+    Pass normalize_prices=False when the prices have already been through normalize_price.
     """
     required_fields = [
         "title", "author", "original_price", "discounted_price", "rating",
-        "num_ratings", "publication_date", "pages", "edition",
+        "num_ratings", "pages", "edition",
         "key_benefits", "description", "what_you_will_learn"
     ]
 
@@ -53,9 +113,14 @@ def validate_book_data(book_data):
         if field not in book_data or not book_data[field]:
             raise ValueError(f"Missing or empty required field: {field}")
 
+    # Publication date is typed and may legitimately be unknown
+    if "publication_date" not in book_data:
+        raise ValueError("Missing required field: publication_date")
+
     # Validate prices
-    book_data['original_price'] = normalize_price(book_data.get('original_price', 'N/A'))
-    book_data['discounted_price'] = normalize_price(book_data.get('discounted_price', 'N/A'))
+    if normalize_prices:
+        book_data['original_price'] = normalize_price(book_data.get('original_price', 'N/A'))
+        book_data['discounted_price'] = normalize_price(book_data.get('discounted_price', 'N/A'))
 
     # Validate ratings (assuming ratings should be numeric)
     try:
@@ -81,10 +146,18 @@ def clean_and_validate_book_data(book_data):
         authors = [a.strip() for a in author.split(',') if a.strip()]
         book_data['author'] = ', '.join(authors)
 
-        # Normalize prices
+        # Parse prices into integer cents and a currency code, keeping a display string
+        original_cents, original_currency = parse_price(book_data.get('original_price'))
+        discounted_cents, discounted_currency = parse_price(book_data.get('discounted_price'))
+        book_data['original_price_cents'] = original_cents
+        book_data['discounted_price_cents'] = discounted_cents
+        book_data['currency'] = discounted_currency or original_currency
         book_data['original_price'] = normalize_price(book_data.get('original_price', 'N/A'))
         book_data['discounted_price'] = normalize_price(book_data.get('discounted_price', 'N/A'))
 
+        # Parse publication date into a real date
+        book_data['publication_date'] = parse_publication_date(book_data.get('publication_date'))
+
         # Convert rating to float
         rating_str = book_data.get('rating', '0').replace('out of 5 stars', '').strip()
         book_data['rating'] = float(rating_str) if rating_str and rating_str != "Rating not found" else None
@@ -92,12 +165,12 @@ def clean_and_validate_book_data(book_data):
         # Convert num_ratings to integer
         num_ratings_str = book_data.get('num_ratings', '0').strip('()')
         book_data['num_ratings'] = int(
-            re.sub(r'\D', '', num_ratings_str)) if num_ratings_str and num_ratings_str != "0" else 0
+            NON_DIGIT_PATTERN.sub('', num_ratings_str)) if num_ratings_str and num_ratings_str != "0" else 0
 
         # Convert pages to integer
         pages_str = book_data.get('pages', '0')
         book_data['pages'] = int(
-            re.sub(r'\D', '', pages_str)) if pages_str and pages_str != "Pages not specified" else None
+            NON_DIGIT_PATTERN.sub('', pages_str)) if pages_str and pages_str != "Pages not specified" else None
 
         # Ensure key_benefits and what_you_will_learn are lists
         book_data['key_benefits'] = book_data.get('key_benefits', []) if isinstance(book_data.get('key_benefits'),
@@ -107,12 +180,180 @@ def clean_and_validate_book_data(book_data):
             book_data.get('what_you_will_learn'), list) else [
             book_data.get('what_you_will_learn', 'No information found')]
 
-        # Validate the data
-        validate_book_data(book_data)
+        # Validate the data; prices were normalized above
+        validate_book_data(book_data, normalize_prices=False)
 
         return book_data
 
     except ValueError as e:
         # Log the validation error
         logging.error(f"Validation Error: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+BATCH_REQUIRED_FIELDS = [
+    "title", "author", "original_price", "discounted_price", "rating",
+    "num_ratings", "pages", "edition",
+    "key_benefits", "description", "what_you_will_learn"
+]
+
+
+class _Rejected:
+    """Marks a column value that makes its record fail validation."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _map_column(column, func):
+    """Applies func once per distinct value of a column; scraped fields repeat heavily across records."""
+    lookup = {}
+    result = []
+    for value in column:
+        try:
+            result.append(lookup[value])
+        except KeyError:
+            lookup[value] = mapped = func(value)
+            result.append(mapped)
+        except TypeError:  # Unhashable values such as lists
+            result.append(func(value))
+    return result
+
+
+def _clean_text_value(value):
+    if value and not isinstance(value, str):
+        return _Rejected(f"'{type(value).__name__}' object has no attribute 'strip'")
+    return clean_text(value)
+
+
+def _clean_author_value(value):
+    if not isinstance(value, str):
+        return _Rejected(f"'{type(value).__name__}' object has no attribute 'replace'")
+    author = value.replace('By,', '').replace(',,', ',').strip()
+    return clean_text(', '.join(a.strip() for a in author.split(',') if a.strip()))
+
+
+def _price_value(value):
+    cents, currency = parse_price(value)
+    return normalize_price(value if value else 'N/A'), cents, currency
+
+
+def _rating_value(value):
+    if not isinstance(value, str):
+        return _Rejected(f"'{type(value).__name__}' object has no attribute 'replace'")
+    rating_str = value.replace('out of 5 stars', '').strip()
+    try:
+        return float(rating_str) if rating_str and rating_str != "Rating not found" else None
+    except ValueError as e:
+        return _Rejected(str(e))
+
+
+def _count_value(value, missing, missing_result):
+    if value and not isinstance(value, str):
+        return _Rejected(f"expected a string, got '{type(value).__name__}'")
+    try:
+        return int(NON_DIGIT_PATTERN.sub('', value)) if value and value != missing else missing_result
+    except ValueError as e:
+        return _Rejected(str(e))
+
+
+def _publication_date_value(value):
+    if value and not isinstance(value, (str, date)):
+        return _Rejected(f"'{type(value).__name__}' object has no attribute 'strip'")
+    return parse_publication_date(value)
+
+
+def _num_ratings_value(value):
+    if not isinstance(value, str):
+        return _Rejected(f"'{type(value).__name__}' object has no attribute 'strip'")
+    return _count_value(value.strip('()'), "0", 0)
+
+
+def _list_column(records, field, default):
+    return [record[field] if isinstance(record.get(field), list) else [record.get(field, default)]
+            for record in records]
+
+
+def clean_and_validate_books(records):
+    """
+    Batch version of clean_and_validate_book_data for many raw records or a DataFrame.
+
+    Each field is cleaned as a column, once per distinct value, with precompiled patterns.
+    Returns (cleaned, errors): cleaned holds the records that passed, with the same values
+    clean_and_validate_book_data would produce, and errors holds one {'index', 'url', 'error'}
+    dict per rejected record. The input is not modified.
+    """
+    if isinstance(records, pd.DataFrame):
+        # NaN cells stand for keys that were absent from the original records
+        records = [{k: v for k, v in record.items() if not (isinstance(v, float) and math.isnan(v))}
+                   for record in records.to_dict('records')]
+    else:
+        records = list(records)
+
+    columns = {
+        'title': _map_column((r.get('title', 'Title not found') for r in records), _clean_text_value),
+        'author': _map_column((r.get('author', 'Author not found') for r in records), _clean_author_value),
+        'original_price': _map_column((r.get('original_price') for r in records), _price_value),
+        'discounted_price': _map_column((r.get('discounted_price') for r in records), _price_value),
+        'publication_date': _map_column((r.get('publication_date') for r in records), _publication_date_value),
+        'rating': _map_column((r.get('rating', '0') for r in records), _rating_value),
+        'num_ratings': _map_column((r.get('num_ratings', '0') for r in records), _num_ratings_value),
+        'pages': _map_column((r.get('pages', '0') for r in records),
+                             lambda v: _count_value(v, "Pages not specified", None)),
+        'key_benefits': _list_column(records, 'key_benefits', 'No key benefits found'),
+        'what_you_will_learn': _list_column(records, 'what_you_will_learn', 'No information found'),
+        'edition': _map_column((r.get('edition') for r in records), _clean_text_value),
+        'description': _map_column((r.get('description') for r in records), _clean_text_value),
+    }
+
+    cleaned = []
+    errors = []
+    for i, record in enumerate(records):
+        original_price, original_cents, original_currency = columns['original_price'][i]
+        discounted_price, discounted_cents, discounted_currency = columns['discounted_price'][i]
+        values = {
+            'title': columns['title'][i],
+            'author': columns['author'][i],
+            'original_price': original_price,
+            'discounted_price': discounted_price,
+            'publication_date': columns['publication_date'][i],
+            'rating': columns['rating'][i],
+            'num_ratings': columns['num_ratings'][i],
+            'pages': columns['pages'][i],
+            'edition': columns['edition'][i],
+            'key_benefits': columns['key_benefits'][i],
+            'description': columns['description'][i],
+            'what_you_will_learn': columns['what_you_will_learn'][i],
+        }
+
+        # Errors are reported in the order clean_and_validate_book_data would raise them
+        error = next((values[field].message
+                      for field in ('title', 'author', 'publication_date', 'rating', 'num_ratings', 'pages')
+                      if isinstance(values[field], _Rejected)), None)
+        if error is None:
+            for field in BATCH_REQUIRED_FIELDS:
+                # edition and description are checked before cleaning, so whitespace-only values pass as ""
+                raw = field in ('edition', 'description')
+                if not (record.get(field) if raw else values[field]) or isinstance(values[field], _Rejected):
+                    error = f"Missing or empty required field: {field}"
+                    break
+        if error is not None:
+            errors.append({'index': i, 'url': record.get('url'), 'error': error})
+            continue
+
+        book_data = dict(record)
+        book_data.update(
+            title=values['title'], author=values['author'],
+            original_price_cents=original_cents, discounted_price_cents=discounted_cents,
+            currency=discounted_currency or original_currency,
+            original_price=original_price, discounted_price=discounted_price,
+            publication_date=values['publication_date'], rating=float(values['rating']),
+            num_ratings=values['num_ratings'], pages=values['pages'],
+            key_benefits=values['key_benefits'], what_you_will_learn=values['what_you_will_learn'],
+            edition=values['edition'], description=values['description'],
+        )
+        cleaned.append(book_data)
+
+    for error in errors:
+        logging.error(f"Validation Error: {error['error']}")
+    return cleaned, errors
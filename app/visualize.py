@@ -1,61 +1,184 @@
 # visualize.py
+import logging
+import os
+import time
+import numpy as np
+import psycopg2
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from psycopg2.extras import RealDictCursor
 
+# Past this, each chart query gives up and the page falls back to the catalog snapshot
+CHART_TIMEOUT_MS = int(os.getenv('CHART_TIMEOUT_MS', 3000))
 
-def visualize_data_page(db_conn):
-    if db_conn:
+# Prices are only comparable within one currency, so price charts show this one
+CHART_CURRENCY = os.getenv('CHART_CURRENCY', 'USD')
+
+PRICE_BINS = 20
+RATING_BINS = 10
+PAGE_RANGE_THRESHOLDS = [1, 101, 201, 301, 401, 501]
+PAGE_RANGE_LABELS = ['0-100', '101-200', '201-300', '301-400', '401-500', '500+']
+
+PRICE_EXPR = "discounted_price_cents / 100.0"
+PUBLICATION_MONTH_EXPR = "date_trunc('month', publication_date)::date"
+
+CHART_QUERIES = {
+    'price_histogram': f"""
+        WITH prices AS (SELECT {PRICE_EXPR} AS price FROM books WHERE currency = %(currency)s),
+             bounds AS (SELECT min(price) AS lo, max(price) + 0.01 AS hi FROM prices)
+        SELECT (lo + (width_bucket(price, lo, hi, {PRICE_BINS}) - 1) * (hi - lo) / {PRICE_BINS})::float8 AS price,
+               count(*) AS books
+        FROM prices, bounds
+        WHERE price IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """,
+    'top_authors': """
+        SELECT author, count(*) AS books
+        FROM books
+        GROUP BY author
+        ORDER BY books DESC, author
+        LIMIT 10
+    """,
+    'rating_histogram': f"""
+        SELECT (least(width_bucket(rating, 0, 5, {RATING_BINS}), {RATING_BINS}) - 1) * 5.0 / {RATING_BINS} AS rating,
+               count(*) AS books
+        FROM books
+        WHERE rating IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """,
+    'ratings_over_time': f"""
+        SELECT {PUBLICATION_MONTH_EXPR} AS publication_date, avg(rating)::float8 AS rating, count(*) AS books
+        FROM books
+        WHERE rating IS NOT NULL AND {PUBLICATION_MONTH_EXPR} IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """,
+    'price_by_rating': f"""
+        SELECT rating, avg({PRICE_EXPR})::float8 AS discounted_price
+        FROM books
+        WHERE rating IS NOT NULL AND currency = %(currency)s
+        GROUP BY rating ORDER BY rating
+    """,
+    'page_ranges': f"""
+        SELECT width_bucket(pages, ARRAY{PAGE_RANGE_THRESHOLDS}) AS page_range, count(*) AS books
+        FROM books
+        WHERE pages >= {PAGE_RANGE_THRESHOLDS[0]}
+        GROUP BY 1 ORDER BY 1
+    """,
+}
+
+
+def load_chart_data(query_cache):
+    """Runs every aggregation through the shared query cache, so they only hit Postgres after books change."""
+    params = {'currency': CHART_CURRENCY}
+    return {name: pd.DataFrame(query_cache.fetch(query, params, timeout_ms=CHART_TIMEOUT_MS))
+            for name, query in CHART_QUERIES.items()}
+
+
+def snapshot_chart_data(table):
+    """The same aggregations as CHART_QUERIES, computed from the catalog snapshot's Arrow table."""
+    books = table.select(['author', 'rating', 'publication_date', 'pages', 'discounted_price_cents',
+                          'currency']).to_pandas()
+    price = (books['discounted_price_cents'] / 100.0).where(books['currency'] == CHART_CURRENCY)
+    rated = books[books['rating'].notna()]
+    chart_data = {}
+
+    prices = price.dropna()
+    if prices.empty:
+        chart_data['price_histogram'] = pd.DataFrame(columns=['price', 'books'])
+    else:
+        lo, hi = prices.min(), prices.max() + 0.01
+        bucket = np.floor((prices - lo) / (hi - lo) * PRICE_BINS)
+        chart_data['price_histogram'] = (lo + bucket * (hi - lo) / PRICE_BINS).value_counts().sort_index() \
+            .rename_axis('price').reset_index(name='books')
+
+    chart_data['top_authors'] = books.groupby('author', dropna=False).size().reset_index(name='books') \
+        .sort_values(['books', 'author'], ascending=[False, True]).head(10)
+
+    bucket = np.clip(np.floor(rated['rating'] / (5.0 / RATING_BINS)), 0, RATING_BINS - 1)
+    chart_data['rating_histogram'] = (bucket * 5.0 / RATING_BINS).value_counts().sort_index() \
+        .rename_axis('rating').reset_index(name='books')
+
+    dated = rated[rated['publication_date'].notna()]
+    month = pd.to_datetime(dated['publication_date']).dt.to_period('M').dt.to_timestamp().dt.date
+    chart_data['ratings_over_time'] = dated.groupby(month.rename('publication_date'))['rating'] \
+        .agg(rating='mean', books='size').reset_index()
+
+    chart_data['price_by_rating'] = price[rated.index].groupby(rated['rating']).mean().dropna() \
+        .rename('discounted_price').reset_index()
+
+    paged = books['pages'][books['pages'] >= PAGE_RANGE_THRESHOLDS[0]]
+    page_range = pd.Series(np.searchsorted(PAGE_RANGE_THRESHOLDS, paged, side='right'), name='page_range')
+    chart_data['page_ranges'] = page_range.value_counts().sort_index().reset_index(name='books')
+    return chart_data
+
+
+def visualize_data_page(db, query_cache, snapshot=None):
+    chart_data = None
+    error = "Database connection is not available. Please check your database connection."
+    if db and query_cache:
         try:
-            with db_conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Fetch all books from the database
-                cur.execute("SELECT * FROM books")
-                results = cur.fetchall()
+            chart_data = load_chart_data(query_cache)
+        except psycopg2.Error as e:
+            error = f"Error retrieving data for visualization: {str(e)}"
+        except Exception as e:
+            st.error(f"Error retrieving data for visualization: {str(e)}")
+            return
 
-            df = pd.DataFrame(results)
+    if chart_data is None:
+        if snapshot is None or snapshot.table() is None:
+            st.error(error)
+            return
+        refreshed = time.strftime("%Y-%m-%d %H:%M", snapshot.refreshed_at)
+        st.warning(f"The database is unavailable, showing charts from the catalog snapshot of {refreshed}.")
+        logging.warning(f"Charts served from the catalog snapshot: {error}")
+        # Aggregated once per snapshot file and shared by every session
+        chart_data = snapshot.cached('charts', snapshot_chart_data)
 
-            if not df.empty:
-                # Price Distribution
-                fig = px.histogram(df, x="discounted_price", nbins=20, title="Distribution of Book Prices")
+    try:
+        if not chart_data['top_authors'].empty:
+            # Price Distribution
+            prices = chart_data['price_histogram']
+            if not prices.empty:
+                fig = px.bar(prices, x="price", y="books", title=f"Distribution of Book Prices ({CHART_CURRENCY})")
                 st.plotly_chart(fig)
 
-                # Top Authors
-                top_authors = df['author'].value_counts().head(10)
-                fig = px.bar(top_authors, x=top_authors.index, y=top_authors.values,
-                             title="Top 10 Authors by Number of Books")
-                st.plotly_chart(fig)
+            # Top Authors
+            top_authors = chart_data['top_authors']
+            fig = px.bar(top_authors, x="author", y="books",
+                         title="Top 10 Authors by Number of Books")
+            st.plotly_chart(fig)
 
-                # Ratings Distribution
-                fig = px.histogram(df, x="rating", nbins=10, title="Distribution of Book Ratings")
+            # Ratings Distribution
+            ratings = chart_data['rating_histogram']
+            if not ratings.empty:
+                fig = px.bar(ratings, x="rating", y="books", title="Distribution of Book Ratings")
                 st.plotly_chart(fig)
 
-                # Publication Date Timeline
-                df['publication_date'] = pd.to_datetime(df['publication_date'])
-                fig = px.scatter(df, x="publication_date", y="rating",
-                                 hover_data=["title", "author"],
+            # Publication Date Timeline
+            ratings_over_time = chart_data['ratings_over_time']
+            if not ratings_over_time.empty:
+                fig = px.scatter(ratings_over_time, x="publication_date", y="rating", size="books",
                                  title="Book Ratings Over Time")
                 st.plotly_chart(fig)
 
-                # New visualization: Average Price by Rating
-                avg_price_by_rating = df.groupby('rating')['discounted_price'].mean().reset_index()
+            # New visualization: Average Price by Rating
+            avg_price_by_rating = chart_data['price_by_rating']
+            if not avg_price_by_rating.empty:
                 fig = px.bar(avg_price_by_rating, x='rating', y='discounted_price',
-                             title="Average Discounted Price by Rating")
+                             title=f"Average Discounted Price by Rating ({CHART_CURRENCY})")
                 st.plotly_chart(fig)
 
-                # New visualization: Number of Books by Page Count Range
-                df['page_range'] = pd.cut(df['pages'], bins=[0, 100, 200, 300, 400, 500, float('inf')],
-                                          labels=['0-100', '101-200', '201-300', '301-400', '401-500', '500+'])
-                books_by_page_range = df['page_range'].value_counts().sort_index()
-                fig = px.bar(x=books_by_page_range.index, y=books_by_page_range.values,
+            # New visualization: Number of Books by Page Count Range
+            books_by_page_range = chart_data['page_ranges']
+            if not books_by_page_range.empty:
+                labels = [PAGE_RANGE_LABELS[bucket - 1] for bucket in books_by_page_range['page_range']]
+                fig = px.bar(x=labels, y=books_by_page_range['books'],
                              title="Number of Books by Page Count Range")
                 fig.update_xaxes(title="Page Range")
                 fig.update_yaxes(title="Number of Books")
                 st.plotly_chart(fig)
 
-            else:
-                st.info("No data available for visualization. Please scrape some books first.")
-        except Exception as e:
-            st.error(f"Error retrieving data for visualization: {str(e)}")
-    else:
-        st.error("Database connection is not available. Please check your database connection.")
\ No newline at end of file
+        else:
+            st.info("No data available for visualization. Please scrape some books first.")
+    except Exception as e:
+        st.error(f"Error retrieving data for visualization: {str(e)}")
@@ -0,0 +1,92 @@
+# bench_cleaning.py
+"""
+Compares the per-dict cleaning path with the batch API on synthetic scraped records.
+
+Run with: python -m benchmarks.bench_cleaning [--records N]
+"""
+import argparse
+import copy
+import logging
+import random
+import time
+from app.utils import clean_and_validate_book_data, clean_and_validate_books
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def make_record(rng, i, gap_rate=0.05):
+    """Builds a raw record shaped like BookScraper output, with some of the usual gaps."""
+    def maybe(value, missing):
+        return missing if rng.random() < gap_rate else value
+
+    price = maybe(rng.choice([f"${rng.randint(9, 80)}.99", f"€{rng.randint(9, 80)}.99"]), "Price not found")
+    return {
+        'title': f"  Mastering   Topic {i}\n {rng.choice(['Second Edition', ''])} ",
+        'author': rng.choice(["By, Jane Doe, John  Smith", "Jane Doe,, John Smith", "Author not found"]),
+        'original_price': price,
+        'discounted_price': maybe(rng.choice([price, f"${rng.randint(5, 40)}.99"]), "Discounted price not found"),
+        'rating': maybe(rng.choice([f"{rng.randint(30, 50) / 10} out of 5 stars", "4.2"]), "Rating not found"),
+        'num_ratings': maybe(rng.choice([f"({rng.randint(1, 500)})", "(1,204)"]), "0"),
+        'publication_date': maybe(f"{rng.choice(MONTHS)} {rng.randint(2015, 2025)}", "Publication date not found"),
+        'pages': maybe(f"{rng.randint(100, 900)}", "Pages not specified"),
+        'edition': rng.choice(["1st Edition", "3rd  Edition", "Edition not specified"]),
+        'key_benefits': rng.choice([["Learn things", "Build  things"], ["No key benefits found"]]),
+        'description': "A practical   guide\nto the topic. " * rng.randint(1, 20),
+        'what_you_will_learn': ["Understand the basics", "Ship to production"],
+        'url': f"https://www.packtpub.com/en-us/product/book-{i}",
+    }
+
+
+# Field overrides the batch API must clean exactly like the per-dict path
+EQUIVALENT_CASES = [{'edition': '   '}, {'description': ' \n '}, {'edition': ''}, {'description': None}]
+
+# Field overrides the per-dict path raises on; the batch API must reject just that record
+REJECTED_CASES = [{'publication_date': 2024}, {'rating': None}, {'num_ratings': None}, {'pages': 12}]
+
+
+def check_edge_cases(rng):
+    base = make_record(rng, 0, gap_rate=0.0)
+    for overrides in EQUIVALENT_CASES:
+        record = dict(base, **overrides)
+        expected = clean_and_validate_book_data(copy.deepcopy(record))
+        cleaned, _ = clean_and_validate_books([record])
+        if cleaned != ([expected] if expected else []):
+            raise SystemExit(f"Batch output differs from clean_and_validate_book_data for {overrides}")
+    for overrides in REJECTED_CASES:
+        cleaned, errors = clean_and_validate_books([base, dict(base, **overrides)])
+        if len(cleaned) != 1 or [error['index'] for error in errors] != [1]:
+            raise SystemExit(f"Batch did not reject just the record with {overrides}")
+
+
+def run(count, seed=0):
+    rng = random.Random(seed)
+    records = [make_record(rng, i) for i in range(count)]
+
+    per_dict_input = copy.deepcopy(records)
+    start = time.perf_counter()
+    expected = [clean_and_validate_book_data(record) for record in per_dict_input]
+    per_dict_seconds = time.perf_counter() - start
+    expected = [record for record in expected if record is not None]
+
+    start = time.perf_counter()
+    cleaned, errors = clean_and_validate_books(records)
+    batch_seconds = time.perf_counter() - start
+
+    if cleaned != expected:
+        raise SystemExit("Batch output differs from clean_and_validate_book_data")
+    check_edge_cases(rng)
+
+    print(f"records:          {count}")
+    print(f"valid / rejected: {len(cleaned)} / {len(errors)}")
+    print(f"per-dict:         {count / per_dict_seconds:,.0f} records/s")
+    print(f"batch:            {count / batch_seconds:,.0f} records/s")
+    print(f"speedup:          {per_dict_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+    # Rejected records are expected here; keep the validation errors out of the output
+    logging.disable(logging.ERROR)
+    run(args.records)
@@ -0,0 +1,384 @@
+# bench_e2e.py
+"""
+End-to-end benchmark against a local stand-in for packtpub.com.
+
+Saved book pages (a directory of .html files, or the page cache) are served from a local HTTP
+server with configurable latency and a configurable fraction of pages missing sections, and the
+real BookScraper is pointed at it. Cleaning and, with --db, upserts into a throwaway schema of
+the configured Postgres are measured on the scraped records.
+
+Results are written as JSON; --compare flags metrics that regressed against an earlier run.
+
+Run with: python -m benchmarks.bench_e2e [--pages 200] [--latency-ms 50] [--missing-rate 0.1]
+          python -m benchmarks.bench_e2e --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import subprocess
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lxml import html
+from app.cache import DEFAULT_CACHE_DIR, PageCache
+from app.metrics import REGISTRY
+from app.scraper import BookScraper
+from app.utils import clean_and_validate_books
+from benchmarks.bench_cleaning import make_record
+
+RESULTS_DIR = "benchmarks/results"
+
+# Sections removed from pages picked by --missing-rate; none of them is required by the HTTP path
+MISSING_SECTION_XPATHS = [
+    "//h2[contains(text(), 'Key benefits')]/following-sibling::ul[1]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' star-rating-total-rating-medium ')]",
+]
+
+# Removed from pages picked by --force-browser-rate: without a price the browser fallback runs,
+# so a non-zero rate needs Chrome and a chromedriver download
+BROWSER_SECTION_XPATHS = [
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' product-details-price ')]",
+]
+
+# Metrics compared by --compare, and whether a higher value is better
+TRACKED_METRICS = {
+    "pages_per_second": True,
+    "clean_records_per_second": True,
+    "upsert_rows_per_second": True,
+    "unchanged_rows_per_second": True,
+    "peak_rss_per_driver_mb": False,
+}
+
+
+def render_book_page(record):
+    """Renders a page with the markup the scraper's selectors expect, from a bench_cleaning record."""
+    def items(values):
+        return "".join(f"<li>{escape(value)}</li>" for value in values)
+
+    # A missing author would force the browser fallback, so every rendered page has one
+    names = [name.strip() for name in record['author'].replace("Author not found", "Jane Doe").split(",")]
+    authors = "".join(f"<span>{escape(name)}</span>" for name in names if name and name != "By")
+    return f"""<!DOCTYPE html><html><head><title>{escape(record['title'])}</title></head><body>
+<h1 class="product-title">{escape(record['title'])}</h1>
+<div class="authors"><span class="label">By</span>{authors}</div>
+<div class="product-details-price"><del>{escape(record['original_price'])}</del>
+<span class="fw-600">{escape(record['discounted_price'])}</span></div>
+<span class="star-rating-total-rating-medium">{escape(record['rating'])}</span>
+<span class="star-rating-total-count">{escape(record['num_ratings'])}</span>
+<div class="product-meta product-details-information">
+<span>{escape(record['publication_date'])}</span><span>{escape(record['pages'])} pages</span>
+<span>{escape(record['edition'])}</span></div>
+<h2>Key benefits</h2><ul>{items(record['key_benefits'])}</ul>
+<h2>Description</h2><div>{escape(record['description'])}</div>
+<h2>What you will learn</h2><ul>{items(record['what_you_will_learn'])}</ul>
+</body></html>"""
+
+
+def drop_sections(page_html, xpaths):
+    tree = html.fromstring(page_html)
+    for xpath in xpaths:
+        for element in tree.xpath(xpath):
+            element.drop_tree()
+    return html.tostring(tree, encoding="unicode")
+
+
+def load_pages(count, pages_dir=None, missing_rate=0.0, force_browser_rate=0.0, seed=0):
+    """
+    Returns `count` page bodies: saved pages from `pages_dir` or the page cache, cycled as
+    needed, or synthetic pages when there are none. `missing_rate` of them lose optional
+    sections, and `force_browser_rate` of them lose the price so they need the browser.
+    """
+    rng = random.Random(seed)
+    if pages_dir:
+        saved = []
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                saved.append(f.read())
+    elif os.path.isdir(DEFAULT_CACHE_DIR):
+        saved = [page_html for _, page_html in PageCache().entries()]
+    else:
+        saved = []
+    if saved:
+        pages = [saved[i % len(saved)] for i in range(count)]
+    else:
+        pages = [render_book_page(make_record(rng, i, gap_rate=0.0)) for i in range(count)]
+    pages = [drop_sections(page, MISSING_SECTION_XPATHS) if rng.random() < missing_rate else page
+             for page in pages]
+    return [drop_sections(page, BROWSER_SECTION_XPATHS) if rng.random() < force_browser_rate else page
+            for page in pages]
+
+
+class StandInServer:
+    """Serves /product/book-<i> from a list of pages, after `latency` seconds (± `jitter`)."""
+
+    def __init__(self, pages, latency=0.0, jitter=0.0):
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    index = int(self.path.rstrip("/").rsplit("-", 1)[1])
+                    body = outer.pages[index].encode("utf-8")
+                except (IndexError, ValueError):
+                    self.send_error(404)
+                    return
+                time.sleep(max(0.0, outer.latency + random.uniform(-outer.jitter, outer.jitter)))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, index):
+        return f"http://127.0.0.1:{self.server.server_port}/product/book-{index}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _children():
+    """Maps pid -> [child pids] from /proc."""
+    children = {}
+    for stat_path in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat_path) as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat_path.split("/")[2]))
+    return children
+
+
+def _descendant_rss_bytes(pid):
+    """Total resident memory of every descendant of `pid` (chromedriver and Chrome processes)."""
+    children = _children()
+    stack = list(children.get(pid, []))
+    total = 0
+    while stack:
+        child = stack.pop()
+        stack.extend(children.get(child, []))
+        try:
+            with open(f"/proc/{child}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler:
+    """Samples the memory of this process's children in the background and keeps the peak."""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _descendant_rss_bytes(os.getpid()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def _counter_name(counter):
+    labels = ",".join(f"{k}={v}" for k, v in counter.items() if k not in ("metric", "value"))
+    return f"{counter['metric']}{{{labels}}}" if labels else counter["metric"]
+
+
+async def bench_scrape(urls, use_http, concurrency):
+    REGISTRY.reset()
+    with RssSampler() as rss:
+        async with BookScraper(headless=True, max_concurrency=concurrency, requests_per_second=0,
+                               use_http=use_http) as scraper:
+            start = time.perf_counter()
+            results = await scraper.scrape_multiple_books(urls)
+            seconds = time.perf_counter() - start
+            drivers = scraper.pool._created
+    timings, counters, _ = REGISTRY.summary()
+    return results, {
+        "pages": len(urls),
+        "scraped": sum(1 for result in results if result),
+        "pages_per_second": len(urls) / seconds,
+        "stage_p95_ms": {timing["stage"]: timing["p95_ms"] for timing in timings},
+        "counters": {_counter_name(counter): counter["value"] for counter in counters},
+        "drivers": drivers,
+        "peak_rss_per_driver_mb": rss.peak / drivers / 2 ** 20 if drivers else None,
+    }
+
+
+def bench_cleaning(records, count):
+    """Cleans `count` copies of the scraped records, each with a distinct URL."""
+    batch = []
+    for i in range(count):
+        record = dict(records[i % len(records)])
+        record['url'] = f"https://www.packtpub.com/product/bench-{i}"
+        batch.append(record)
+    start = time.perf_counter()
+    cleaned, errors = clean_and_validate_books(batch)
+    seconds = time.perf_counter() - start
+    return cleaned, {"clean_records": count, "clean_rejected": len(errors),
+                     "clean_records_per_second": count / seconds}
+
+
+def bench_upsert(books, batch_size):
+    """Upserts into a throwaway schema: once as inserts, then again unchanged, then with price changes."""
+    from app.db import BookWriter, ConnectionManager
+
+    schema = f"bench_{os.getpid()}"
+    db = ConnectionManager.from_env(max_size=1)
+    try:
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE SCHEMA {schema}")
+                cur.execute(f"SET search_path TO {schema}, public")
+                cur.execute("""
+                CREATE TABLE books (
+                    title TEXT, author TEXT, original_price TEXT, discounted_price TEXT,
+                    rating DOUBLE PRECISION, num_ratings INTEGER, publication_date DATE, pages INTEGER,
+                    edition TEXT, key_benefits JSONB, description TEXT, what_you_will_learn JSONB, url TEXT
+                )
+                """)
+            conn.commit()
+            try:
+                timings = {}
+                repriced = [dict(book, discounted_price_cents=(book['discounted_price_cents'] or 0) + 100)
+                            for book in books]
+                for phase, rows in (("upsert", books), ("unchanged", books), ("changed", repriced)):
+                    writer = BookWriter(conn, batch_size=batch_size)
+                    start = time.perf_counter()
+                    for book in rows:
+                        writer.add(book)
+                    writer.flush()
+                    timings[f"{phase}_rows_per_second"] = len(rows) / (time.perf_counter() - start)
+                return timings
+            finally:
+                with conn.cursor() as cur:
+                    cur.execute(f"DROP SCHEMA {schema} CASCADE")
+                conn.commit()
+    finally:
+        db.close()
+
+
+def compare(current, baseline, tolerance):
+    """Returns a description of every tracked metric that is worse than `baseline` by more than `tolerance`."""
+    regressions = []
+    for metric, higher_is_better in TRACKED_METRICS.items():
+        new, old = current.get(metric), baseline.get(metric)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{metric}: {old:,.1f} -> {new:,.1f} ({change:+.0%})")
+    for stage, new in current.get("stage_p95_ms", {}).items():
+        old = baseline.get("stage_p95_ms", {}).get(stage)
+        if new and old and (new - old) / old > tolerance:
+            regressions.append(f"p95 {stage}: {old:.1f}ms -> {new:.1f}ms ({(new - old) / old:+.0%})")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    pages = load_pages(args.pages, args.pages_dir, args.missing_rate, args.force_browser_rate, args.seed)
+    with StandInServer(pages, args.latency_ms / 1000, args.jitter_ms / 1000) as server:
+        urls = [server.url(i) for i in range(len(pages))]
+        results, scrape = asyncio.run(bench_scrape(urls, not args.browser_only, args.concurrency))
+
+    records = [result for result in results if result]
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        **scrape,
+    }
+    if records:
+        # Rejected records are expected here; keep the validation errors out of the output
+        logging.disable(logging.ERROR)
+        try:
+            cleaned, cleaning = bench_cleaning(records, args.clean_records)
+        finally:
+            logging.disable(logging.NOTSET)
+        result.update(cleaning)
+        if args.db:
+            result.update(bench_upsert(cleaned[:args.upsert_rows], args.batch_size))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="Pages to scrape")
+    parser.add_argument("--pages-dir", help="Directory of saved .html book pages (default: the page cache)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Server latency per page")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Random +/- added to the latency")
+    parser.add_argument("--missing-rate", type=float, default=0.1,
+                        help="Fraction of pages with optional sections removed")
+    parser.add_argument("--force-browser-rate", type=float, default=0.0,
+                        help="Fraction of pages without a price, scraped by the browser fallback (needs Chrome)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--browser-only", action="store_true", help="Skip the HTTP fast path")
+    parser.add_argument("--clean-records", type=int, default=20000)
+    parser.add_argument("--db", action="store_true", help="Also benchmark upserts against the DB_* Postgres")
+    parser.add_argument("--upsert-rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help=f"Results file (default: {RESULTS_DIR}/e2e-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change before flagging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    result = run(args)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps({key: value for key, value in result.items() if key != "config"}, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# bench_startup.py
+"""
+Measures Streamlit cold start: import time of each page module and time to first paint of
+each page, every measurement in a fresh interpreter. Fails when a budget is exceeded or a page
+loads a heavy dependency it does not use (e.g. Search loading Selenium).
+
+Run with: python -m benchmarks.bench_startup [--paint-budget-ms 3000] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RESULTS_DIR = "benchmarks/results"
+
+PAGE_MODULES = ["app.search", "app.visualize", "app.diagnostics", "app.pipeline", "app.scraper", "app.export"]
+
+# Heavy modules a page must not load just by rendering. Streamlit itself already imports
+# plotly, pandas and pyarrow, so only the scraping stack is worth checking.
+FORBIDDEN_MODULES = {
+    "Scrape Books": ["selenium", "webdriver_manager"],
+    "Search Books": ["selenium", "webdriver_manager", "lxml.html"],
+    "Visualize Data": ["selenium", "webdriver_manager", "lxml.html"],
+    "Diagnostics": ["selenium", "webdriver_manager", "lxml.html"],
+}
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000}}))
+"""
+
+# Runs the app headlessly with Streamlit's AppTest; the default page renders first
+PAINT_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+page = {page!r}
+start = time.perf_counter()
+at = AppTest.from_file("main.py", default_timeout=60).run()
+first_paint = time.perf_counter() - start
+if page != at.sidebar.selectbox[0].value:
+    start = time.perf_counter()
+    at.sidebar.selectbox[0].set_value(page).run()
+    page_paint = time.perf_counter() - start
+else:
+    page_paint = first_paint
+print(json.dumps({{
+    "first_paint_ms": first_paint * 1000,
+    "page_paint_ms": page_paint * 1000,
+    "exceptions": [str(e.value) for e in at.exception],
+    "loaded": sorted(name for name in {forbidden!r} if name in sys.modules),
+}}))
+"""
+
+
+def _run(script):
+    env = dict(os.environ)
+    # Keep the app from reaching a real database while it is being timed
+    env.setdefault("DB_HOST", "127.0.0.1")
+    env.setdefault("DB_PORT", "1")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(paint_budget_ms, import_budget_ms):
+    result = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "imports_ms": {}, "pages": {}, "violations": []}
+
+    for module in ["streamlit"] + PAGE_MODULES:
+        result["imports_ms"][module] = _run(IMPORT_SCRIPT.format(module=module))["ms"]
+
+    for page, forbidden in FORBIDDEN_MODULES.items():
+        measured = _run(PAINT_SCRIPT.format(page=page, forbidden=forbidden))
+        result["pages"][page] = measured
+        if measured["page_paint_ms"] > paint_budget_ms:
+            result["violations"].append(f"{page}: painted in {measured['page_paint_ms']:.0f}ms, "
+                                        f"budget {paint_budget_ms:.0f}ms")
+        for exception in measured["exceptions"]:
+            result["violations"].append(f"{page}: raised {exception}")
+        if measured["loaded"]:
+            result["violations"].append(f"{page}: loaded {', '.join(measured['loaded'])}")
+
+    # The shell the app needs before any page renders
+    first_paint = result["pages"]["Scrape Books"]["first_paint_ms"]
+    if first_paint > paint_budget_ms:
+        result["violations"].append(f"First paint took {first_paint:.0f}ms, budget {paint_budget_ms:.0f}ms")
+    for module in ("app.search", "app.diagnostics"):
+        if result["imports_ms"][module] > import_budget_ms:
+            result["violations"].append(f"Importing {module} took {result['imports_ms'][module]:.0f}ms, "
+                                        f"budget {import_budget_ms:.0f}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paint-budget-ms", type=float, default=3000.0,
+                        help="Maximum time to first paint of any page")
+    parser.add_argument("--import-budget-ms", type=float, default=1500.0,
+                        help="Maximum import time of the lightweight page modules")
+    parser.add_argument("--output", help=f"Results file (default: {RESULTS_DIR}/startup-<timestamp>.json)")
+    args = parser.parse_args()
+
+    result = run(args.paint_budget_ms, args.import_budget_ms)
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    for module, ms in result["imports_ms"].items():
+        print(f"import {module:<16} {ms:8.0f} ms")
+    for page, measured in result["pages"].items():
+        print(f"paint  {page:<16} {measured['page_paint_ms']:8.0f} ms")
+    print(f"Results written to {output}")
+    for violation in result["violations"]:
+        print(f"BUDGET {violation}")
+    if result["violations"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,187 +1,196 @@
 # main.py
-import pandas as pd
 import streamlit as st
 import asyncio
 import logging
 import os
-from app.scraper import BookScraper
-from app.search import search_books_page
-from app.visualize import visualize_data_page
-from app.utils import clean_and_validate_book_data, validate_url
-from streamlit_lottie import st_lottie
 import json
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+from app import metrics
+from app.db import ConnectionManager
 
-# Load environment variables
-load_dotenv()
+# Page modules and their heavy dependencies (Selenium, plotly, pyarrow, pandas) are imported
+# inside the page functions, so each page only pays for what it uses.
 
-# Set up logging
-log_dir = "data/logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+# Set page config
+st.set_page_config(page_title="Packt Book Scraper", page_icon="📚", layout="wide")
+
+
+@st.cache_resource
+def init_environment():
+    """Loads environment variables and sets up logging once per process instead of on every rerun."""
+    load_dotenv()
+    log_dir = "data/logs"
+    os.makedirs(log_dir, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(log_dir, "scraper.log"),
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    return True
+
+
+init_environment()
+
+
+# Initialize the shared PostgreSQL connection pool
+@st.cache_resource
+def init_db():
+    return ConnectionManager.from_env(
+        min_size=int(os.getenv('DB_POOL_MIN', 1)),
+        max_size=int(os.getenv('DB_POOL_MAX', 10)),
+        statement_timeout_ms=int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000)),
+    )
 
-logging.basicConfig(
-    filename=os.path.join(log_dir, "scraper.log"),
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
 
-# Database connection parameters
-DB_HOST = os.getenv('DB_HOST')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_PORT = os.getenv('DB_PORT')
+# Connections are opened lazily, on the first query
+db = init_db()
+
+
+@st.cache_resource
+def init_metrics_server():
+    """Serves /metrics for Prometheus when METRICS_PORT is set."""
+    port = os.getenv('METRICS_PORT')
+    return metrics.start_http_server(int(port)) if port else None
+
+
+init_metrics_server()
+
 
-# Initialize PostgreSQL connection
 @st.cache_resource
-def init_db_connection():
+def init_query_cache(_db):
+    """Query results shared by every session, invalidated when the books table changes."""
+    from app.query_cache import QueryCache
+    return QueryCache(_db, max_bytes=int(os.getenv('QUERY_CACHE_MB', 64)) * 1024 * 1024)
+
+
+def get_query_cache():
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            port=DB_PORT,
-            sslmode='require'
-        )
-        return conn
+        return init_query_cache(db)
     except Exception as e:
-        st.error(f"Failed to connect to the database: {str(e)}")
+        # Not cached on failure, so the next rerun tries again
+        logging.error(f"Failed to initialize the query cache: {str(e)}")
         return None
 
 
-# Set page config
-st.set_page_config(page_title="Packt Book Scraper", page_icon="📚", layout="wide")
+@st.cache_resource
+def init_snapshot():
+    """Memory-mapped catalog snapshot that read-only pages fall back to when the database is down."""
+    from app.snapshot import CatalogSnapshot
+    return CatalogSnapshot()
+
 
-# Initialize database connection
-db_conn = init_db_connection()
+@st.cache_resource
+def init_page_cache():
+    from app.cache import PageCache
+    return PageCache()
 
 
 @st.cache_resource
 def init_scraper():
+    from app.scraper import BookScraper
     return BookScraper()
 
 
-async def scrape_books(urls, db_conn):
-    scraper = BookScraper(headless=True)
-    results = []
-    for url in urls:
-        if validate_url(url):
-            result = await scraper.scrape_book_details(url)
-            if result:
-                cleaned_result = clean_and_validate_book_data(result)
-                if cleaned_result:
-                    # Add the URL as a unique identifier
-                    cleaned_result['url'] = url
-                    results.append(cleaned_result)
-                    # Check if the book already exists in the database
-                    if db_conn:
-                        try:
-                            with db_conn.cursor(cursor_factory=RealDictCursor) as cur:
-                                cur.execute("SELECT * FROM books WHERE url = %s", (url,))
-                                existing_book = cur.fetchone()
-
-                                if existing_book:
-                                    # Update existing book
-                                    update_query = """
-                                    UPDATE books SET 
-                                        title = %s, author = %s, original_price = %s, discounted_price = %s,
-                                        rating = %s, num_ratings = %s, publication_date = %s, pages = %s,
-                                        edition = %s, key_benefits = %s, description = %s, what_you_will_learn = %s
-                                    WHERE url = %s
-                                    """
-                                    cur.execute(update_query, (
-                                        cleaned_result['title'], cleaned_result['author'],
-                                        cleaned_result['original_price'], cleaned_result['discounted_price'],
-                                        cleaned_result['rating'], cleaned_result['num_ratings'],
-                                        cleaned_result['publication_date'], cleaned_result['pages'],
-                                        cleaned_result['edition'], json.dumps(cleaned_result['key_benefits']),
-                                        cleaned_result['description'],
-                                        json.dumps(cleaned_result['what_you_will_learn']),
-                                        url
-                                    ))
-                                    db_conn.commit()
-                                    logging.info(f"Book '{cleaned_result['title']}' updated in the database")
-                                    st.info(f"Book '{cleaned_result['title']}' updated in the database")
-                                else:
-                                    # Insert new book
-                                    insert_query = """
-                                    INSERT INTO books (
-                                        title, author, original_price, discounted_price, rating, num_ratings,
-                                        publication_date, pages, edition, key_benefits, description, what_you_will_learn, url
-                                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                    """
-                                    cur.execute(insert_query, (
-                                        cleaned_result['title'], cleaned_result['author'],
-                                        cleaned_result['original_price'], cleaned_result['discounted_price'],
-                                        cleaned_result['rating'], cleaned_result['num_ratings'],
-                                        cleaned_result['publication_date'], cleaned_result['pages'],
-                                        cleaned_result['edition'], json.dumps(cleaned_result['key_benefits']),
-                                        cleaned_result['description'],
-                                        json.dumps(cleaned_result['what_you_will_learn']),
-                                        url
-                                    ))
-                                    db_conn.commit()
-                                    logging.info(f"Book '{cleaned_result['title']}' stored in the database")
-                                    st.success(f"Book '{cleaned_result['title']}' stored in the database")
-                        except Exception as e:
-                            logging.error(
-                                f"Failed to store/update book '{cleaned_result['title']}' in the database: {str(e)}")
-                            st.error(
-                                f"Failed to store/update book '{cleaned_result['title']}' in the database. Error: {str(e)}")
-        else:
-            logging.warning(f"Invalid URL: {url}")
-    return results
-
-
-def update_export_files(db_conn):
+async def scrape_books(urls, db, progress_bar, status_text, max_concurrency=2, requests_per_second=1.0,
+                       batch_size=100):
+    """Scrapes the URLs, showing each book and database result as soon as it is ready."""
+    from app.pipeline import URL_EVENTS, stream_urls
+    from app.scraper import BookScraper
+
+    books = []
+    unchanged = 0
+    changed = 0
+    completed = 0
+    async with BookScraper(headless=True, max_concurrency=max_concurrency,
+                           requests_per_second=requests_per_second, cache=init_page_cache()) as scraper:
+        async for event in stream_urls(scraper, urls, db, batch_size=batch_size):
+            kind = event['type']
+            if kind == 'book':
+                books.append(event['book'])
+                st.write(event['book'])
+            elif kind == 'invalid':
+                st.warning(f"Invalid URL: {event['url']}")
+            elif kind == 'failed':
+                st.warning(f"Failed to scrape {event['url']}")
+            elif kind == 'rejected':
+                st.warning(f"Book '{event['url']}' failed validation: {event['error']}")
+            elif kind == 'stored' and event['status'] == 'inserted':
+                changed += 1
+                logging.info(f"Book '{event['url']}' stored in the database")
+                st.success(f"Book '{event['url']}' stored in the database")
+            elif kind == 'stored' and event['status'] == 'updated':
+                changed += 1
+                logging.info(f"Book '{event['url']}' updated in the database")
+                st.info(f"Book '{event['url']}' updated in the database")
+            elif kind == 'stored':
+                unchanged += 1
+            elif kind == 'db_error':
+                st.error(f"Failed to store/update books in the database. Error: {event['error']}")
+
+            if kind in URL_EVENTS:
+                completed += 1
+                progress_bar.progress(completed / len(urls))
+                status_text.text(f"Scraped {completed}/{len(urls)} URLs")
+
+    if unchanged:
+        st.info(f"{unchanged} books unchanged since their last scrape")
+    if changed:
+        refresh_catalog_snapshot(db)
+    return books
+
+
+def refresh_catalog_snapshot(db):
+    from app.snapshot import refresh_snapshot
     try:
-        with db_conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM books")
-            results = cur.fetchall()
-
-        df = pd.DataFrame(results)
-
-        # Ensure the data directory exists
-        os.makedirs('data', exist_ok=True)
+        # Only the rows changed since the last refresh are read
+        refresh_snapshot(db)
+    except Exception as e:
+        logging.error(f"Failed to refresh the catalog snapshot: {str(e)}")
+        st.warning(f"Failed to refresh the catalog snapshot. Error: {str(e)}")
 
-        # Update CSV file
-        df.to_csv('data/scraped_books.csv', index=False)
-        logging.info("CSV file updated successfully")
 
-        # Update JSON file
-        df.to_json('data/scraped_books.json', orient='records')
-        logging.info("JSON file updated successfully")
+def update_export_files(db, incremental=True):
+    from app.export import export_books
+    try:
+        # Streams the table to CSV, JSON and Parquet without loading it into memory
+        exported = export_books(db, incremental=incremental)
+        logging.info(f"Export files updated successfully ({exported} books written)")
 
     except Exception as e:
         logging.error(f"Failed to update export files: {str(e)}")
         st.error(f"Failed to update export files. Error: {str(e)}")
 
-def load_css():
-    """Function to load the custom CSS for styling."""
-    css_file_path = "app/assets/style.css"
+@st.cache_resource
+def read_asset(path):
+    """Reads a static asset once per process; None if it does not exist."""
     try:
-        with open(css_file_path, "r") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        with open(path, "r") as f:
+            return f.read()
     except FileNotFoundError:
-        st.error(f"CSS file not found: {css_file_path}")
+        return None
 
 
+@st.cache_resource
 def load_lottie_file(filepath: str):
-    """Function to load a Lottie animation from a JSON file."""
-    try:
-        with open(filepath, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        st.error(f"Lottie file not found: {filepath}")
-        return None
+    """Loads and parses a Lottie animation once per process."""
+    text = read_asset(filepath)
+    return json.loads(text) if text is not None else None
+
+
+def load_css():
+    """Function to load the custom CSS for styling."""
+    css_file_path = "app/assets/style.css"
+    css = read_asset(css_file_path)
+    if css is None:
+        st.error(f"CSS file not found: {css_file_path}")
+        return
+    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
 
 def sidebar_lottie_animations():
     """Load and display Lottie animations for GitHub, LinkedIn, and Portfolio in the sidebar."""
+    from streamlit_lottie import st_lottie
+
     # Paths to Lottie JSON files
     lottie_github_path = "app/assets/images/github.json"
     lottie_linkedin_path = "app/assets/images/linkedin.json"
@@ -191,6 +200,10 @@ def sidebar_lottie_animations():
     lottie_github = load_lottie_file(lottie_github_path)
     lottie_linkedin = load_lottie_file(lottie_linkedin_path)
     lottie_portfolio = load_lottie_file(lottie_portfolio_path)
+    for path, animation in ((lottie_github_path, lottie_github), (lottie_linkedin_path, lottie_linkedin),
+                            (lottie_portfolio_path, lottie_portfolio)):
+        if animation is None:
+            st.error(f"Lottie file not found: {path}")
 
     # Sidebar Lottie Animations with Links
     with st.sidebar:
@@ -248,15 +261,7 @@ def scrape_books_page():
 
     if st.button("Scrape Books") and urls:
         with st.spinner('Scraping in progress...'):
-            results = asyncio.run(scrape_books(urls, db_conn))
-            total_urls = len(urls)
-
-            for i, result in enumerate(results):
-                st.write(result)
-
-                progress = (i + 1) / total_urls
-                progress_bar.progress(progress)
-                status_text.text(f"Scraping {i + 1}/{total_urls} URLs")
+            asyncio.run(scrape_books(urls, db, progress_bar, status_text))
 
         st.success("Scraping completed!")
         status_text.text("Scraping finished.")
@@ -276,16 +281,21 @@ def main():
     )
 
     # Sidebar for navigation
-    page = st.sidebar.selectbox("Choose a page", ["Scrape Books", "Search Books", "Visualize Data"])
+    page = st.sidebar.selectbox("Choose a page", ["Scrape Books", "Search Books", "Visualize Data", "Diagnostics"])
 
     sidebar_lottie_animations()  # Display sidebar Lottie animations
 
     if page == "Scrape Books":
         scrape_books_page()
     elif page == "Search Books":
-        search_books_page(db_conn)
+        from app.search import search_books_page
+        search_books_page(db, get_query_cache(), init_snapshot())
     elif page == "Visualize Data":
-        visualize_data_page(db_conn)
+        from app.visualize import visualize_data_page
+        visualize_data_page(db, get_query_cache(), init_snapshot())
+    elif page == "Diagnostics":
+        from app.diagnostics import diagnostics_page
+        diagnostics_page(get_query_cache())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file